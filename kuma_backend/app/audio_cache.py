@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+import time
+import traceback
+
+# ============================================================
+# 🔉 TTS Audio Cache
+# ============================================================
+# Kuma says the same things over and over ("Aye aye, Captain! I'm
+# listening.", intent replies). Synthesized audio is stored on disk under
+# a hash of (model, voice, text), so a phrase is only ever fetched once,
+# by the backend or by any client: they all share one directory. The
+# directory is capped in bytes and evicts least recently used files; a
+# hit refreshes the file's modification time, so other processes see it
+# as recently used too. Writes go through a temporary file and a rename,
+# so a reader never sees half an MP3.
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".kuma", "tts_cache")
+
+
+class AudioCache:
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=64 * 1024 * 1024, extension="mp3"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.bytes = sum(size for _, _, size in self._files())
+
+    @staticmethod
+    def key(text: str, voice: str, model: str) -> str:
+        text = " ".join(text.split())
+        return hashlib.sha256(f"{model}\x00{voice}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{self.extension}")
+
+    def get(self, text: str, voice: str, model: str):
+        """Cached audio bytes, or None."""
+        path = self.path(self.key(text, voice, model))
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)  # most recently used
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return audio
+
+    def put(self, text: str, voice: str, model: str, audio: bytes):
+        path = self.path(self.key(text, voice, model))
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        with self.lock:
+            self.bytes += len(audio)
+            over = self.bytes > self.max_bytes
+        if over:
+            self._evict()
+        return path
+
+    def get_or_create(self, text: str, voice: str, model: str, synthesize):
+        """Cached audio for text, calling synthesize() -> bytes on a miss."""
+        audio = self.get(text, voice, model)
+        if audio is None:
+            audio = synthesize()
+            if audio:
+                self.put(text, voice, model, audio)
+        return audio
+
+    def contains(self, text: str, voice: str, model: str) -> bool:
+        return os.path.exists(self.path(self.key(text, voice, model)))
+
+    def prewarm(self, phrases, voice: str, model: str, synthesize, background=True):
+        """Make sure every phrase is cached; synthesize(text) -> bytes.
+
+        Runs on a daemon thread by default, so startup does not wait for it.
+        """
+        def run():
+            fetched = 0
+            start = time.perf_counter()
+            for text in dict.fromkeys(p for p in phrases if p and p.strip()):
+                if self.contains(text, voice, model):
+                    continue
+                try:
+                    audio = synthesize(text)
+                    if not audio:
+                        continue  # never cache silence as the phrase's audio
+                    self.put(text, voice, model, audio)
+                    fetched += 1
+                except Exception:
+                    traceback.print_exc()
+                    return  # offline or no quota: the rest would fail the same way
+            if fetched:
+                print(f"🔉 TTS cache: pre-warmed {fetched} phrases in {time.perf_counter() - start:.1f}s")
+
+        if not background:
+            return run()
+        thread = threading.Thread(target=run, name="kuma-tts-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def _files(self):
+        """(mtime, path, size) of every cached file."""
+        files = []
+        suffix = f".{self.extension}"
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(suffix):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.path, stat.st_size))
+        return files
+
+    def _evict(self):
+        # rescan: other processes write to the same directory
+        files = sorted(self._files())
+        total = sum(size for _, _, size in files)
+        evicted = 0
+        for _, path, size in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self.lock:
+            self.bytes = total
+            self.evictions += evicted
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
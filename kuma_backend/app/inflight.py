@@ -0,0 +1,148 @@
+import asyncio
+import time
+from contextlib import suppress
+
+# ============================================================
+# 🛑 Cancellable & Speculative Requests
+# ============================================================
+# Clients may tag a query with a request_id and later withdraw it
+# (POST /query/cancel): the model call stops at once instead of running
+# to the end for nobody. Voice clients also start "speculative" requests
+# from a partial transcript before the user has finished speaking. Such a
+# turn must not reach memory or session history unless the client later
+# confirms it (POST /query/commit), so its memory write is held back.
+
+
+class RequestCancelled(Exception):
+    """The client withdrew the request."""
+
+
+class InflightRequest:
+    def __init__(self, request_id=None, speculative=False):
+        self.request_id = request_id
+        self.speculative = speculative
+        self.cancelled = asyncio.Event()
+        self.committed = not speculative
+        self.on_commit = None  # held-back memory write of a finished speculative turn
+        self.finished_at = None
+
+
+class InflightRequests:
+    """Requests by client request_id. Only used from the event loop thread."""
+
+    def __init__(self, commit_ttl=60.0):
+        self.commit_ttl = commit_ttl
+        self.requests = {}
+        self.cancellations = 0
+        self.commits = 0
+
+    def start(self, request_id=None, speculative=False):
+        self._expire()
+        request = InflightRequest(request_id, speculative)
+        if request_id:
+            previous = self.requests.get(request_id)
+            if previous:
+                previous.cancelled.set()
+            self.requests[request_id] = request
+        return request
+
+    def cancel(self, request_id):
+        request = self.requests.pop(request_id, None)
+        if request is None:
+            return False
+        request.cancelled.set()
+        request.on_commit = None
+        self.cancellations += 1
+        return True
+
+    def commit(self, request_id):
+        request = self.requests.get(request_id)
+        if request is None or request.cancelled.is_set():
+            return False
+        request.committed = True
+        self.commits += 1
+        if request.on_commit:
+            on_commit, request.on_commit = request.on_commit, None
+            self.requests.pop(request_id, None)
+            on_commit()
+        return True
+
+    def complete(self, request, on_commit):
+        """The turn finished: write it now, or once the client commits."""
+        request.finished_at = time.monotonic()
+        if request.committed:
+            on_commit()
+        elif not request.cancelled.is_set():
+            request.on_commit = on_commit
+
+    def release(self, request):
+        """Forget request when its handler is done, unless it still waits for a commit."""
+        if request.on_commit is None and self.requests.get(request.request_id) is request:
+            del self.requests[request.request_id]
+
+    def stats(self):
+        return {
+            "in_flight": sum(1 for r in self.requests.values() if r.finished_at is None),
+            "awaiting_commit": sum(1 for r in self.requests.values() if r.on_commit),
+            "cancellations": self.cancellations,
+            "commits": self.commits,
+        }
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.commit_ttl
+        for request_id, request in list(self.requests.items()):
+            if request.finished_at is not None and request.finished_at < cutoff:
+                del self.requests[request_id]
+
+
+async def until_cancelled(awaitable, cancelled):
+    """Await awaitable, unless cancelled (an asyncio.Event) is set first:
+    then the awaitable is cancelled and RequestCancelled is raised."""
+    task = asyncio.ensure_future(awaitable)
+    waiter = asyncio.ensure_future(cancelled.wait())
+    try:
+        done, _ = await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        task.cancel()
+        raise
+    finally:
+        waiter.cancel()
+    if task in done:
+        return task.result()
+    task.cancel()
+    with suppress(asyncio.CancelledError, Exception):
+        await task
+    raise RequestCancelled()
+
+
+async def iterate_until_cancelled(agen, cancelled):
+    """Items of the async generator agen until cancelled is set.
+
+    One task owns agen for its whole life, so cancelling it (which closes
+    the model's HTTP stream) never happens half-way through another
+    task's step of the generator.
+    """
+    queue = asyncio.Queue()
+    end = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                queue.put_nowait((item, None))
+            queue.put_nowait((end, None))
+        except Exception as e:
+            queue.put_nowait((end, e))
+
+    producer = asyncio.ensure_future(pump())
+    try:
+        while True:
+            item, error = await until_cancelled(queue.get(), cancelled)
+            if item is end:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
@@ -0,0 +1,125 @@
+import json
+import re
+from collections import deque, namedtuple
+
+# ============================================================
+# 🧭 Intent Matcher
+# ============================================================
+# Intents are declared as data (intents.json): a name, trigger phrases and
+# an action. All phrases are compiled into one word-level Aho-Corasick
+# automaton, so an utterance is resolved in a single pass over its words
+# no matter how many intents exist. Matching on whole words means "time"
+# no longer fires on "sometimes" and "open x" only on the word "x".
+#
+# When several intents match, the one listed first in the table wins.
+#
+# The same table is loaded by the clients (kuma_client/local_intents.py).
+# Intents marked "client": true touch no server state, so a client may
+# answer them in-process without calling the backend.
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text):
+    """Lowercase words with their (start, end) character offsets."""
+    text = text.lower().replace("’", "'")
+    return [(m.group(), m.start(), m.end()) for m in WORD_RE.finditer(text)]
+
+
+class Intent:
+    def __init__(self, name, phrases, action, priority=0, **options):
+        self.name = name
+        self.phrases = list(phrases)
+        self.action = action
+        self.priority = priority
+        self.options = options
+
+    def get(self, key, default=None):
+        return self.options.get(key, default)
+
+    def __repr__(self):
+        return f"Intent({self.name!r}, action={self.action!r})"
+
+
+class IntentMatch(namedtuple("IntentMatch", "intent phrase start end")):
+    """Which intent matched, on which phrase, and where (character offsets)."""
+
+    def remainder(self, text):
+        """The utterance text after the matched phrase (e.g. the fact to remember)."""
+        return text[self.end:].strip(" .,!?")
+
+    def reason(self):
+        return f"phrase '{self.phrase}' matched at chars {self.start}-{self.end}"
+
+
+class IntentMatcher:
+    def __init__(self, intents):
+        self.intents = list(intents)
+        # automaton: goto transitions, failure links, outputs per state
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for priority, intent in enumerate(self.intents):
+            intent.priority = priority
+            for phrase in intent.phrases:
+                words = [w for w, _, _ in tokenize(phrase)]
+                if words:
+                    self._insert(words, (priority, len(words), phrase))
+        self._link()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        return cls(Intent(**spec) for spec in table)
+
+    def __len__(self):
+        return len(self.intents)
+
+    def _insert(self, words, output):
+        state = 0
+        for word in words:
+            nxt = self.goto[state].get(word)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][word] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(output)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and word not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(word, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def match_all(self, text):
+        """Every (intent, phrase) occurrence in text, in order of position."""
+        tokens = tokenize(text)
+        matches = []
+        state = 0
+        for i, (word, _, end) in enumerate(tokens):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for priority, length, phrase in self.out[state]:
+                start = tokens[i - length + 1][1]
+                matches.append(IntentMatch(self.intents[priority], phrase, start, end))
+        return matches
+
+    def match(self, text):
+        """The winning IntentMatch for text, or None."""
+        best = None
+        for m in self.match_all(text):
+            if best is None or (m.intent.priority, m.start) < (best.intent.priority, best.start):
+                best = m
+        return best
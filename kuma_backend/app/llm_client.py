@@ -0,0 +1,145 @@
+import asyncio
+import random
+import time
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+# ============================================================
+# 🧠 Async LLM Client
+# ============================================================
+# One AsyncOpenAI client on top of one pooled httpx.AsyncClient, shared by
+# every request. A semaphore caps how many completions are in flight at
+# once, every call runs against a deadline, and transient failures are
+# retried with jittered exponential backoff inside that deadline.
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The completion did not finish before the request's deadline."""
+
+
+class LLMClient:
+    def __init__(self, api_key=None, base_url=None, max_in_flight=16, pool_size=32,
+                 timeout=30.0, max_retries=2, backoff_base=0.25, backoff_cap=4.0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_in_flight = max_in_flight
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(timeout, connect=5.0),
+        )
+        # retries are ours (deadline-aware), so the SDK must not retry on its own
+        self.openai = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                  http_client=self.http, max_retries=0)
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+
+    async def aclose(self):
+        await self.openai.close()
+
+    def _deadline(self, timeout=None):
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        return time.monotonic() + timeout
+
+    @staticmethod
+    def _remaining(deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded("LLM deadline exceeded")
+        return remaining
+
+    def _backoff(self, attempt):
+        # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def _acquire(self, deadline):
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self._remaining(deadline))
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded("Timed out waiting for a free LLM slot") from None
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    async def _sleep_before_retry(self, attempt, deadline):
+        delay = self._backoff(attempt)
+        if delay >= self._remaining(deadline):
+            raise LLMDeadlineExceeded("No time left to retry the LLM call")
+        await asyncio.sleep(delay)
+
+    async def complete(self, messages, timeout=None, **params) -> str:
+        """Return the reply text for a chat completion."""
+        deadline = self._deadline(timeout)
+        await self._acquire(deadline)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await asyncio.wait_for(
+                        self.openai.chat.completions.create(messages=messages, **params),
+                        self._remaining(deadline),
+                    )
+                    return (response.choices[0].message.content or "").strip()
+                except asyncio.TimeoutError:
+                    raise LLMDeadlineExceeded("LLM deadline exceeded") from None
+                except RETRYABLE_ERRORS:
+                    if attempt >= self.max_retries:
+                        raise
+                    await self._sleep_before_retry(attempt, deadline)
+                    attempt += 1
+        finally:
+            self._release()
+
+    async def stream(self, messages, timeout=None, **params):
+        """Yield reply text deltas as the model generates them.
+
+        A failed call is only retried if nothing has been yielded yet;
+        once text reached the caller the error is raised instead.
+        """
+        deadline = self._deadline(timeout)
+        await self._acquire(deadline)
+        try:
+            attempt = 0
+            while True:
+                produced = False
+                try:
+                    stream = await asyncio.wait_for(
+                        self.openai.chat.completions.create(messages=messages, stream=True, **params),
+                        self._remaining(deadline),
+                    )
+                    try:
+                        iterator = stream.__aiter__()
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(iterator.__anext__(),
+                                                               self._remaining(deadline))
+                            except StopAsyncIteration:
+                                return
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content or ""
+                            if delta:
+                                produced = True
+                                yield delta
+                    finally:
+                        await stream.close()
+                except asyncio.TimeoutError:
+                    raise LLMDeadlineExceeded("LLM deadline exceeded") from None
+                except RETRYABLE_ERRORS:
+                    if produced or attempt >= self.max_retries:
+                        raise
+                    await self._sleep_before_retry(attempt, deadline)
+                    attempt += 1
+        finally:
+            self._release()
@@ -1,30 +1,106 @@
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 import os
 import json
+import math
+import re
 import webbrowser
 from datetime import datetime
 from openai import OpenAI
-import requests
-import geocoder
 from pydub import AudioSegment
 from pydub.playback import play
 import io
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .audio_cache import DEFAULT_DIR as TTS_CACHE_DEFAULT_DIR, AudioCache
+from .inflight import InflightRequests, RequestCancelled, iterate_until_cancelled, until_cancelled
+from .intents import IntentMatcher
+from .llm_client import LLMClient
+from .metrics import Registry, StageTimer
+from .memory_index import HashingEmbedder, MemoryIndex, OpenAIEmbedder
+from .memory_store import MemoryStore
+from .summarizer import ConversationCompactor, ExtractiveSummarizer, LLMSummarizer
+from .sessions import DEFAULT_SESSION, SessionStore
+from .prompt_builder import PromptBuilder, TokenCounter
+from .response_cache import ResponseCache, fingerprint
+from .tts_worker import TTSWorker
+from .weather import WTTR_URL, WeatherProvider
 
 # ============================================================
 # ⚙️ ENV & CONFIG
 # ============================================================
 load_dotenv()
 
-MEMORY_FILE = "memory.json"
+MEMORY_FILE = "memory.json"  # legacy store, imported into MEMORY_DB on first start
+MEMORY_DB = os.getenv("MEMORY_DB", "memory.db")
 TASK_FILE = "tasks.json"
-MAX_MEMORY_ITEMS = 50
+MAX_MEMORY_ITEMS = 50  # shown by /memory
+# Everything up to MEMORY_RETENTION is kept on disk and searchable
+MEMORY_RETENTION = int(os.getenv("MEMORY_RETENTION", "100000"))
+MEMORY_COMPACT_INTERVAL = float(os.getenv("MEMORY_COMPACT_INTERVAL", "300"))
 RECENT_MEMORIES_FOR_PROMPT = 5
+RELEVANT_MEMORIES_FOR_PROMPT = int(os.getenv("RELEVANT_MEMORIES_FOR_PROMPT", "5"))
+# "hashing" works offline; "openai" uses the embeddings API
+MEMORY_EMBEDDER = os.getenv("MEMORY_EMBEDDER", "hashing")
 
 MODEL = os.getenv("MODEL", "gpt-4o-mini")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point at any OpenAI-compatible server (e.g. stub_openai.py for local testing)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Chat completion limits
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Server-side speech: set SERVER_TTS=0 when every client speaks for itself
+SERVER_TTS = os.getenv("SERVER_TTS", "1") != "0"
+TTS_QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", "4"))
+TTS_MODEL = os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+# Synthesized audio is cached on disk, shared with the clients (audio_cache.py)
+TTS_CACHE_DIR = os.getenv("KUMA_TTS_CACHE_DIR", TTS_CACHE_DEFAULT_DIR)
+TTS_CACHE_MB = float(os.getenv("KUMA_TTS_CACHE_MB", "64"))
+# Fetch the fixed phrases (intent replies...) at startup so they never wait on the network
+TTS_PREWARM = os.getenv("TTS_PREWARM", "1") == "1"
+
+# Weather lookups (cached; refreshed in the background)
+WEATHER_URL = os.getenv("WEATHER_URL", WTTR_URL)
+WEATHER_TTL = float(os.getenv("WEATHER_TTL", "600"))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "3"))
+
+# Prompt size: everything sent to the model must fit this many tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# history is trimmed in blocks of this many messages to keep the prefix stable
+PROMPT_HISTORY_BLOCK = int(os.getenv("PROMPT_HISTORY_BLOCK", "8"))
+
+# Rolling summary: once a session's raw history passes SUMMARY_TRIGGER_TOKENS,
+# all but the last SUMMARY_KEEP_RECENT messages are folded into a summary
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "1200"))
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "8"))
+# "llm" summarizes with MODEL; "extractive" is a local stand-in (no API calls)
+SUMMARIZER = os.getenv("SUMMARIZER", "llm")
+
+# Conversation sessions (one per client session_id)
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "256"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", "2000000"))
+
+# Opt-in cache of LLM replies for repeated questions
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# the cache key includes this many of the session's latest messages
+CACHE_CONTEXT_MESSAGES = int(os.getenv("CACHE_CONTEXT_MESSAGES", "4"))
+
+# A finished speculative reply is forgotten if not committed within this many seconds
+SPECULATION_COMMIT_TTL = float(os.getenv("SPECULATION_COMMIT_TTL", "60"))
 
 # ============================================================
 # 🚀 FastAPI Setup
@@ -35,12 +111,52 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# ============================================================
+# 📊 Metrics & Server-Timing
+# ============================================================
+metrics = Registry()
+stage_seconds = metrics.histogram(
+    "kuma_stage_seconds", "Time spent in each stage of a query", ["stage"])
+http_request_seconds = metrics.histogram(
+    "kuma_http_request_seconds", "Time until response headers, per route", ["method", "route"])
+requests_total = metrics.counter(
+    "kuma_queries_total", "Queries by route and how they were answered", ["route", "outcome"])
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Give each request a StageTimer and report it as a Server-Timing header."""
+    timer = request.state.timer = StageTimer(stage_seconds)
+    start = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - start
+    route = request.scope.get("route")
+    http_request_seconds.observe(total, method=request.method, route=route.path if route else "unmatched")
+    timer.record("total", total, observe=False)
+    response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
 # ============================================================
 # 🧠 OpenAI Client
 # ============================================================
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Sync client: used by the TTS worker thread only
+client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+# Async pooled client: every chat completion goes through this one
+llm = LLMClient(
+    api_key=OPENAI_API_KEY,
+    base_url=OPENAI_BASE_URL,
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    pool_size=LLM_POOL_SIZE,
+    timeout=LLM_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+)
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm.aclose()
 
 # ============================================================
 # 📂 Memory System
@@ -58,28 +174,71 @@ def save_json_file(file_path, data):
     with open(file_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
-def load_memory():
-    return load_json_file(MEMORY_FILE, [])
+memory_store = MemoryStore(MEMORY_DB, retention=MEMORY_RETENTION, legacy_json=MEMORY_FILE)
 
-def save_memory(mem):
-    mem = mem[-MAX_MEMORY_ITEMS:]
-    save_json_file(MEMORY_FILE, mem)
+if MEMORY_EMBEDDER == "openai":
+    embedder = OpenAIEmbedder(client)
+else:
+    embedder = HashingEmbedder()
+# API embeddings are stored next to the memories, so a restart only embeds new ones
+memory_index = MemoryIndex(embedder, max_items=MEMORY_RETENTION,
+                           vector_store=memory_store if embedder.remote else None)
+# a remote embedder would hold up the turn: new memories are indexed on one
+# background thread instead (one, so clears and adds keep their order)
+memory_indexer = ThreadPoolExecutor(1, thread_name_prefix="kuma-memory-index") if embedder.remote else None
+
+def index_memories(entries):
+    try:
+        memory_index.add(entries)
+    except Exception:
+        traceback.print_exc()
+
+def load_memory():
+    return memory_store.recent(MAX_MEMORY_ITEMS)
 
 def add_memory(text: str):
-    mem = load_memory()
-    entry = {"text": text, "time": datetime.now().isoformat()}
-    mem.append(entry)
-    save_memory(mem)
-    return entry
+    return add_memories([text])[0]
+
+def add_memories(texts):
+    """Persist memories in one commit and make them searchable."""
+    entries = memory_store.add_many(texts)
+    if memory_indexer:
+        memory_indexer.submit(index_memories, entries)
+    else:
+        memory_index.add(entries)
+    return entries
 
 def get_recent_memory(n=RECENT_MEMORIES_FOR_PROMPT):
-    mem = load_memory()
-    return mem[-n:] if mem else []
+    return memory_store.recent(n)
+
+def get_relevant_memory(query: str, k=RELEVANT_MEMORIES_FOR_PROMPT):
+    """Memories most similar to query, best first. May block (API
+    embeddings): async handlers run it once per request in the threadpool."""
+    return [entry for _, entry in memory_index.search(query, k=k)]
 
 def clear_memory():
-    save_memory([])
+    memory_store.clear()
+    if memory_indexer:
+        # after any add still queued, or it would come back
+        memory_indexer.submit(memory_index.clear).result()
+    else:
+        memory_index.clear()
     return []
 
+@app.on_event("startup")
+def build_memory_index():
+    memory_index.rebuild(memory_store.all())
+
+@app.on_event("startup")
+def start_memory_compactor():
+    memory_store.start_compactor(MEMORY_COMPACT_INTERVAL)
+
+@app.on_event("shutdown")
+def close_memory_store():
+    if memory_indexer:
+        memory_indexer.shutdown(wait=True)
+    memory_store.close()
+
 # ============================================================
 # 🧾 To-Do Task System
 # ============================================================
@@ -109,166 +268,410 @@ def clear_tasks():
 # ============================================================
 # 🔊 TTS (Voice Output)
 # ============================================================
-def speak_kuma(text: str):
-    """Generate and play TTS audio safely"""
+tts_cache = AudioCache(TTS_CACHE_DIR, max_bytes=int(TTS_CACHE_MB * 1024 * 1024))
+
+# Said as-is by the backend, besides the intent replies
+SPOKEN_PHRASES = [
+    "No tasks in your list yet, Captain!",
+    "All tasks cleared, Captain!",
+    "I don't remember anything yet, Captain.",
+    "What should I remind you about, Captain?",
+]
+
+def fetch_speech(text: str) -> bytes:
+    """MP3 audio for text from the TTS API"""
+    speech = client.audio.speech.create(
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text
+    )
+    audio_stream = io.BytesIO()
+    # speech.iter_bytes() may be used depending on SDK; using read() fallback if available
     try:
-        speech = client.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",
-            input=text
-        )
-        audio_stream = io.BytesIO()
-        # speech.iter_bytes() may be used depending on SDK; using read() fallback if available
+        # if response supports iter_bytes
+        for chunk in speech.iter_bytes():
+            audio_stream.write(chunk)
+    except Exception:
+        # try reading whole content
         try:
-            # if response supports iter_bytes
-            for chunk in speech.iter_bytes():
-                audio_stream.write(chunk)
+            audio_stream.write(speech.read())
         except Exception:
-            # try reading whole content
-            try:
-                audio_stream.write(speech.read())
-            except Exception:
-                pass
-        audio_stream.seek(0)
-        sound = AudioSegment.from_file(audio_stream, format="mp3")
-        play(sound)
-    except Exception as e:
-        print(f"🎧 [Voice Error]: {e}")
-        traceback.print_exc()
+            pass
+    return audio_stream.getvalue()
+
+def synthesize_speech(text: str):
+    """TTS audio for text (from the cache when possible) as a playable segment"""
+    audio = tts_cache.get_or_create(text, TTS_VOICE, TTS_MODEL, lambda: fetch_speech(text))
+    return AudioSegment.from_file(io.BytesIO(audio), format="mp3")
+
+def timed_synthesis(text: str):
+    with stage_seconds.time(stage="tts_synthesis"):
+        return synthesize_speech(text)
+
+def timed_playback(audio):
+    with stage_seconds.time(stage="tts_playback"):
+        play(audio)
+
+tts_worker = TTSWorker(synthesize=timed_synthesis, play=timed_playback, max_queue=TTS_QUEUE_SIZE)
+
+def speak_kuma(text: str, interrupt: bool = True):
+    """Queue text for the background TTS worker (never blocks the request).
+
+    A new reply interrupts whatever older reply is still waiting to be spoken.
+    """
+    if not SERVER_TTS:
+        return False
+    return tts_worker.say(text, interrupt=interrupt)
+
+@app.on_event("startup")
+def start_tts_worker():
+    if SERVER_TTS:
+        tts_worker.start()
+
+@app.on_event("startup")
+def prewarm_tts_cache():
+    if SERVER_TTS and TTS_PREWARM:
+        phrases = SPOKEN_PHRASES + [i.get("reply") for i in intent_matcher.intents if i.get("reply")]
+        tts_cache.prewarm(phrases, TTS_VOICE, TTS_MODEL, fetch_speech)
+
+@app.on_event("shutdown")
+def stop_tts_worker():
+    tts_worker.stop()
 
 # ============================================================
 # 🌦️ Weather Helper
 # ============================================================
+weather = WeatherProvider(
+    weather_url=WEATHER_URL,
+    timeout=WEATHER_TIMEOUT,
+    forecast_ttl=WEATHER_TTL,
+)
+
+@app.on_event("startup")
+def prefetch_weather():
+    weather.prefetch()
+
 def get_weather():
-    """Fetch simple weather info using wttr.in"""
-    try:
-        g = geocoder.ip("me")
-        city = g.city or g.state or "your area"
-    except Exception:
-        city = "your area"
-    try:
-        resp = requests.get("https://wttr.in/?format=3", timeout=6)
-        if resp.status_code == 200:
-            return f"The weather in {city} is: {resp.text}, Captain."
-        else:
-            return f"Couldn't fetch weather for {city}, Captain."
-    except Exception:
-        return "Couldn't fetch the weather right now, Captain."
+    """Weather from the cached provider (never waits on a repeat lookup)"""
+    city = weather.city()
+    forecast = weather.forecast()
+    if forecast:
+        return f"The weather in {city} is: {forecast}, Captain."
+    return f"Couldn't fetch the weather for {city} right now, Captain."
 
 # ============================================================
 # ⚙️ Local Command Handler
 # ============================================================
+# Intents are declared in intents.json and compiled into one matcher;
+# each intent's "action" picks one of the functions below.
+INTENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+intent_matcher = IntentMatcher.from_file(INTENTS_FILE)
+
+def intent_remember(intent, text, match):
+    fact = match.remainder(text)
+    if not fact:
+        return None  # "do you remember ..." style questions go to the AI
+    add_memory(fact)
+    return f"I'll remember: {fact}"
+
+def intent_recall(intent, text, match):
+    mem = get_recent_memory(8)
+    if not mem:
+        return "I don't remember anything yet, Captain."
+    lines = [f"- {m['text']}" for m in mem]
+    return "I remember:\n" + "\n".join(lines)
+
+def intent_add_task(intent, text, match):
+    task = match.remainder(text)
+    if not task:
+        return "What should I remind you about, Captain?"
+    return add_task(task)
+
+def intent_clock(intent, text, match):
+    return datetime.now().strftime(intent.get("format"))
+
+def intent_open_url(intent, text, match):
+    webbrowser.open(intent.get("url"))
+    return intent.get("reply")
+
+def intent_run(intent, text, match):
+    os.system(intent.get("command"))
+    return intent.get("reply")
+
+def intent_open_folder(intent, text, match):
+    path = os.path.join(os.path.expanduser("~"), intent.get("folder"))
+    os.startfile(path)
+    return intent.get("reply")
+
+INTENT_ACTIONS = {
+    "remember": intent_remember,
+    "recall": intent_recall,
+    "add_task": intent_add_task,
+    "view_tasks": lambda intent, text, match: view_tasks(),
+    "clear_tasks": lambda intent, text, match: clear_tasks(),
+    "clock": intent_clock,
+    "weather": lambda intent, text, match: get_weather(),
+    "reply": lambda intent, text, match: intent.get("reply"),
+    "open_url": intent_open_url,
+    "run": intent_run,
+    "open_folder": intent_open_folder,
+}
+
 def local_handle(text: str):
-    t = text.lower()
-
-    # 🧠 Memory
-    if t.startswith("remember ") or " remember " in t:
-        idx = t.find("remember")
-        fact = text[idx + len("remember"):].strip(" .,")
-        if not fact:
-            return "What should I remember, Captain?"
-        add_memory(fact)
-        return f"I'll remember: {fact}"
-
-    if "what do you remember" in t or "what do you know" in t or "what did i tell you" in t:
-        mem = load_memory()
-        if not mem:
-            return "I don't remember anything yet, Captain."
-        lines = [f"- {m['text']}" for m in mem[-8:]]
-        return "I remember:\n" + "\n".join(lines)
-
-    # 🧾 Tasks
-    if "add task" in t or "remind me to" in t:
-        task = text.split("to")[-1].strip(" .")
-        if not task:
-            return "What should I remind you about, Captain?"
-        return add_task(task)
-    if "show tasks" in t or "what are my tasks" in t or "show reminders" in t:
-        return view_tasks()
-    if "clear tasks" in t or "delete all tasks" in t:
-        return clear_tasks()
-
-    # 🕒 Utilities
-    if "time" in t:
-        return datetime.now().strftime("It's %I:%M %p, Captain.")
-    if "date" in t:
-        return datetime.now().strftime("Today is %A, %B %d, %Y, Captain.")
-    if "weather" in t or "temperature" in t:
-        return get_weather()
-    if "joke" in t:
-        return "Why did the pirate bring a bar of soap? Because he wanted to wash ashore! 😂"
-
-    # ⚓ App shortcuts
-    if "open youtube" in t:
-        webbrowser.open("https://youtube.com")
-        return "Opened YouTube for you, Captain."
-    if "open tradingview" in t or "tradingview" in t:
-        webbrowser.open("https://www.tradingview.com")
-        return "Opened TradingView for you, Captain."
-    if "open steam" in t:
-        webbrowser.open("steam://open/main")
-        return "Attempting to open Steam, Captain."
-    if "open chrome" in t:
-        os.system("start chrome")
-        return "Opening Chrome, Captain!"
-    if "open notepad" in t:
-        os.system("start notepad")
-        return "Opening Notepad, Captain!"
-    if "open vs code" in t or "open visual studio code" in t:
-        os.system("code")
-        return "Opening VS Code, Captain!"
-
-    # 🗂️ Folder shortcuts
-    folders = {
-        "downloads": "Downloads",
-        "documents": "Documents",
-        "desktop": "Desktop",
-        "music": "Music",
-        "pictures": "Pictures"
-    }
-    for key, folder in folders.items():
-        if f"open {key}" in t:
-            path = os.path.join(os.path.expanduser("~"), folder)
-            os.startfile(path)
-            return f"Opened {folder} folder, Captain!"
-
-    # 🎵 Music
-    if "play song" in t or "play music" in t:
-        music_path = os.path.join(os.path.expanduser("~"), "Music")
-        os.startfile(music_path)
-        return "Opening your music collection, Captain!"
-
-    # 🌐 Sites
-    sites = {
-        "google": "https://www.google.com",
-        "reddit": "https://www.reddit.com",
-        "x": "https://x.com",
-        "twitter": "https://x.com",
-        "gmail": "https://mail.google.com"
-    }
-    for key, url in sites.items():
-        if f"open {key}" in t:
-            webbrowser.open(url)
-            return f"Opened {key.capitalize()} for you, Captain!"
-
-    return None
-
-# ============================================================
-# NEW: Conversation context (in-memory session)
-# ============================================================
-conversation_history = []  # list of {"role": "user"/"assistant", "content": "..."}
-MAX_CONVERSATION_HISTORY = 12  # keep last N turns for context
-
-def add_conversation(role: str, content: str):
-    """Append to in-memory conversation history (role: 'user' or 'assistant')"""
-    global conversation_history
-    conversation_history.append({"role": role, "content": content, "time": datetime.now().isoformat()})
-    # keep only last MAX_CONVERSATION_HISTORY entries
-    conversation_history = conversation_history[-MAX_CONVERSATION_HISTORY:]
-
-def clear_conversation():
-    global conversation_history
-    conversation_history = []
+    """Answer text from the intent table, or None. May block (weather,
+    opening apps): async handlers run it with run_in_threadpool."""
+    match = intent_matcher.match(text)
+    if not match:
+        return None
+    print(f"🧭 Intent: {match.intent.name} ({match.reason()})")
+    return INTENT_ACTIONS[match.intent.action](match.intent, text, match)
+
+# ============================================================
+# 💬 Conversation context (per-session, in-memory)
+# ============================================================
+# hard cap on raw messages per session; normally compaction keeps it far lower
+MAX_CONVERSATION_HISTORY = 200
+
+sessions = SessionStore(
+    max_turns=MAX_CONVERSATION_HISTORY,
+    max_sessions=MAX_SESSIONS,
+    idle_ttl=SESSION_IDLE_TTL,
+    max_chars=SESSION_MAX_CHARS,
+)
+
+# ============================================================
+# 🧩 Prompt & Turn Helpers
+# ============================================================
+SYSTEM_PROMPT = (
+    "You are Kuma — a loyal pirate AI assistant aboard the Thousand Sunny. "
+    "You are cheerful, helpful, and always call the user 'Captain'. "
+    "Keep replies short, witty, and natural like a friend at sea."
+)
+
+prompt_builder = PromptBuilder(
+    SYSTEM_PROMPT,
+    TokenCounter(MODEL),
+    budget=PROMPT_TOKEN_BUDGET,
+    history_block=PROMPT_HISTORY_BLOCK,
+)
+
+if SUMMARIZER == "extractive":
+    summarizer = ExtractiveSummarizer()
+else:
+    summarizer = LLMSummarizer(llm, MODEL)
+compactor = ConversationCompactor(
+    summarizer,
+    prompt_builder.counter,
+    trigger_tokens=SUMMARY_TRIGGER_TOKENS,
+    keep_recent=SUMMARY_KEEP_RECENT,
+)
+
+def build_messages(text: str, session, relevant):
+    """Build the chat messages for a user utterance within the token budget.
+
+    - System personality prompt (static, always first: cacheable prefix)
+    - Summary of older turns, if the session has been compacted
+    - Recent conversation from this client's session
+    - Recent persistent memories and older memories relevant to this
+      utterance (relevant, from get_relevant_memory), in one message
+      after the history
+    - The user's text, capped to part of the budget
+    """
+    summary, first_index, history = session.window()
+    # session history entries use 'role' keys 'user'/'assistant'
+    history = [{"role": item["role"], "content": item["content"]} for item in history]
+    return prompt_builder.build(
+        text,
+        history=history,
+        first_index=first_index,
+        recent_memories=[m["text"] for m in get_recent_memory()],
+        related_memories=[m["text"] for m in relevant],
+        summary=summary,
+    )
+
+def remember_turn(text: str, reply: str, session, memory=True):
+    """Persist a finished turn to memory (unless memory=False) and the
+    session's conversation."""
+    if memory:
+        # both lines go to disk in one commit
+        add_memories([f"User: {text}", f"Kuma: {reply}"])
+    session.add_turn(text, reply)
+    # fold old turns into the summary in the background if the session grew
+    compactor.maybe_schedule(session)
+
+# ============================================================
+# 💾 Response Cache
+# ============================================================
+response_cache = ResponseCache(max_items=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+def reply_cache_key(text: str, session, relevant):
+    """Normalised prompt + fingerprint of what shapes the answer: model,
+    persona, the facts recalled for this prompt and where the session's
+    conversation stands (its summary and latest turns), so a follow-up
+    like "why?" never gets the answer given in another conversation.
+    Logged turns in memory ("User: ..."/"Kuma: ...") are left out on
+    purpose: asking a question logs it, so otherwise a repeated question
+    could never hit."""
+    facts = [m["text"] for m in relevant if not m["text"].startswith(("User: ", "Kuma: "))]
+    summary, _, history = session.window()
+    recent = [f"{m['role']}:{m['content']}" for m in history[-CACHE_CONTEXT_MESSAGES:]]
+    return response_cache.key(text, fingerprint(MODEL, SYSTEM_PROMPT, *facts, summary, *recent))
+
+def cached_reply(text: str, session, relevant, bypass=False):
+    """(cache key, cached reply or None); key is None when caching is off."""
+    if not RESPONSE_CACHE or bypass:
+        return None, None
+    key = reply_cache_key(text, session, relevant)
+    return key, response_cache.get(key)
+
+# ============================================================
+# 🛑 Cancellable & Speculative Requests
+# ============================================================
+inflight = InflightRequests(commit_ttl=SPECULATION_COMMIT_TTL)
+
+# ============================================================
+# 📊 Metric gauges (read at scrape time)
+# ============================================================
+metrics.observe("kuma_llm_in_flight", "Chat completions currently in flight", lambda: llm.in_flight)
+metrics.observe("kuma_tts_queue_depth", "Sentences waiting for the TTS worker", lambda: tts_worker.pending())
+metrics.observe("kuma_sessions", "Conversation sessions held in memory", lambda: len(sessions.sessions))
+metrics.observe("kuma_memory_index_entries", "Memories in the semantic index", lambda: len(memory_index))
+metrics.observe("kuma_response_cache_lookups_total", "Response cache lookups by result",
+                lambda: {"hit": response_cache.hits, "miss": response_cache.misses},
+                type="counter", labelname="result")
+metrics.observe("kuma_compactions_total", "Background conversation compactions by result",
+                lambda: {"ok": compactor.compactions, "failed": compactor.failures},
+                type="counter", labelname="result")
+metrics.observe("kuma_tts_cache_lookups_total", "TTS audio cache lookups by result",
+                lambda: {"hit": tts_cache.hits, "miss": tts_cache.misses},
+                type="counter", labelname="result")
+metrics.observe("kuma_tts_cache_bytes", "Bytes of audio in the TTS cache", lambda: tts_cache.bytes)
+metrics.observe("kuma_tracked_requests", "Requests with a request_id, by state",
+                lambda: {k: v for k, v in inflight.stats().items() if k in ("in_flight", "awaiting_commit")},
+                labelname="state")
+
+# ============================================================
+# 📡 Streaming (Server-Sent Events)
+# ============================================================
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+def split_sentences(buffer: str):
+    """Split off complete sentences; returns (sentences, remainder)."""
+    parts = SENTENCE_END.split(buffer)
+    return [p for p in parts[:-1] if p.strip()], parts[-1]
+
+def sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def stream_reply(text: str, session, timer, turn, timeout=None, no_cache=False):
+    """Yield SSE events for one turn: a 'sentence' event per finished
+    sentence while the model generates, then a single 'done' event that
+    also carries the per-stage timings (headers are long gone by then).
+
+    turn is the InflightRequest: the model call stops when it is
+    cancelled, and a speculative turn is only remembered once committed.
+    """
+    def save(reply):
+        def write():
+            with timer.stage("memory_write"):
+                remember_turn(text, reply, session)
+        inflight.complete(turn, write)
+
+    try:
+        if turn.speculative and intent_matcher.match(text):
+            # intents act at once (tasks, memories...): wait for the final transcript
+            requests_total.inc(route="/query/stream", outcome="refused")
+            yield sse_event({"type": "refused"})
+            return
+
+        with timer.stage("local_handle"):
+            local_reply = await run_in_threadpool(local_handle, text)
+        if local_reply:
+            save(local_reply)
+            requests_total.inc(route="/query/stream", outcome="local")
+            yield sse_event({"type": "sentence", "text": local_reply})
+            yield sse_event({"type": "done", "reply": local_reply, "timings": timer.as_dict()})
+            return
+
+        with timer.stage("recall"):
+            relevant = await run_in_threadpool(get_relevant_memory, text)
+
+        with timer.stage("cache_lookup"):
+            cache_key, hit = cached_reply(text, session, relevant, bypass=no_cache)
+        if hit:
+            save(hit)
+            requests_total.inc(route="/query/stream", outcome="cached")
+            sentences, rest = split_sentences(hit)
+            for sentence in sentences + ([rest] if rest.strip() else []):
+                yield sse_event({"type": "sentence", "text": sentence.strip()})
+            yield sse_event({"type": "done", "reply": hit, "cached": True, "timings": timer.as_dict()})
+            return
+
+        with timer.stage("prompt"):
+            messages = build_messages(text, session, relevant)
+
+        parts = []
+        buffer = ""
+        llm_start = time.perf_counter()
+        try:
+            deltas = llm.stream(
+                messages,
+                timeout=timeout,
+                model=MODEL,
+                temperature=0.5,
+                max_tokens=180
+            )
+            async for delta in iterate_until_cancelled(deltas, turn.cancelled):
+                if not parts and not buffer:
+                    timer.record("llm_first_token", time.perf_counter() - llm_start)
+                buffer += delta
+                sentences, buffer = split_sentences(buffer)
+                for sentence in sentences:
+                    parts.append(sentence.strip())
+                    yield sse_event({"type": "sentence", "text": sentence.strip()})
+            if buffer.strip():
+                parts.append(buffer.strip())
+                yield sse_event({"type": "sentence", "text": buffer.strip()})
+            timer.record("llm", time.perf_counter() - llm_start)
+        except RequestCancelled:
+            timer.record("llm", time.perf_counter() - llm_start)
+            requests_total.inc(route="/query/stream", outcome="cancelled")
+            yield sse_event({"type": "cancelled"})
+            return
+        except Exception as e:
+            timer.record("llm", time.perf_counter() - llm_start)
+            traceback.print_exc()
+            if not parts:
+                fallback = await run_in_threadpool(local_handle, text)
+                if fallback:
+                    save(fallback)
+                    requests_total.inc(route="/query/stream", outcome="fallback")
+                    yield sse_event({"type": "sentence", "text": fallback})
+                    yield sse_event({"type": "done", "reply": fallback, "timings": timer.as_dict()})
+                else:
+                    requests_total.inc(route="/query/stream", outcome="error")
+                    yield sse_event({"type": "error", "message": f"Error contacting AI: {e}"})
+                return
+            # cut off mid-answer: the client keeps what it already got, but the
+            # turn is neither remembered nor cached as a complete answer
+            requests_total.inc(route="/query/stream", outcome="partial")
+            event = {"type": "done", "reply": " ".join(parts), "partial": True,
+                     "message": f"Error contacting AI: {e}", "timings": timer.as_dict()}
+            if buffer.strip():
+                event["unfinished"] = buffer.strip()
+            yield sse_event(event)
+            return
+
+        reply = " ".join(parts)
+        # Persist memory once the stream is complete
+        if reply:
+            save(reply)
+            if cache_key:
+                response_cache.set(cache_key, reply)
+        requests_total.inc(route="/query/stream", outcome="llm")
+        yield sse_event({"type": "done", "reply": reply, "timings": timer.as_dict()})
+    finally:
+        inflight.release(turn)
 
 # ============================================================
 # 🌊 Routes
@@ -277,117 +680,214 @@ def clear_conversation():
 def home():
     return {"message": "🏴‍☠️ Kuma AI backend is sailing strong, Captain!"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/memory")
 def view_memory():
     return {"memory": load_memory()}
 
+@app.get("/intent")
+def explain_intent(text: str):
+    """Which local intent (if any) an utterance resolves to, and why."""
+    match = intent_matcher.match(text)
+    if not match:
+        return {"intent": None}
+    return {"intent": match.intent.name, "action": match.intent.action, "reason": match.reason()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"enabled": RESPONSE_CACHE, **response_cache.stats(), "tts": tts_cache.stats()}
+
+@app.post("/cache/clear")
+def api_clear_cache():
+    response_cache.clear()
+    return {"ok": True, "message": "Response cache cleared."}
+
 @app.post("/memory/clear")
 def api_clear_memory():
     clear_memory()
     return {"ok": True, "message": "Memory cleared."}
 
-# NEW: endpoints for conversation
+# Conversation endpoints take the client's session_id (query parameter)
 @app.get("/conversation")
-def get_conversation():
-    """Return current in-memory conversation history (useful for debugging)."""
-    return {"conversation": conversation_history}
+def get_conversation(session_id: str = None):
+    """Return a session's in-memory conversation history (useful for debugging)."""
+    session = sessions.peek(session_id)
+    return {"session_id": session_id or DEFAULT_SESSION,
+            "summary": session.summary if session else "",
+            "conversation": session.snapshot() if session else []}
+
+@app.get("/sessions")
+def get_sessions():
+    return sessions.stats()
 
 @app.post("/conversation/clear")
-def api_clear_conversation():
-    clear_conversation()
+def api_clear_conversation(session_id: str = None):
+    sessions.drop(session_id)
     return {"ok": True, "message": "Conversation cleared."}
 
+def parse_timeout(value):
+    """Per-request deadline in seconds from a request body, None if absent.
+    Raises ValueError unless it is a positive number."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(value)
+    timeout = float(value)
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise ValueError(value)
+    return timeout
+
+def bad_timeout(route):
+    requests_total.inc(route=route, outcome="bad_request")
+    return JSONResponse({"error": "timeout must be a positive number of seconds"}, status_code=400)
+
 @app.post("/query")
 async def query(request: Request):
     data = await request.json()
     text = data.get("text", "").strip()
+    # clients that do their own TTS send {"speak": false}
+    speak = data.get("speak", True)
+    # optional per-request deadline in seconds (capped at LLM_TIMEOUT)
+    try:
+        timeout = parse_timeout(data.get("timeout"))
+    except ValueError:
+        return bad_timeout("/query")
+    # {"no_cache": true} always asks the model, even for a repeated question
+    no_cache = data.get("no_cache", False)
+    # {"intents": false} is for text nobody said (screen reads): no local
+    # intents (they act: open apps, clear tasks...), no memory, no cache
+    intents = data.get("intents", True) is not False
+    session = sessions.get(data.get("session_id"))
+    # per-stage timings; the middleware turns them into Server-Timing
+    timer = request.state.timer
 
     if not text:
+        requests_total.inc(route="/query", outcome="empty")
         return {"reply": "I didn’t hear anything, Captain. Can you repeat that?"}
 
     # Local check (unchanged behaviour)
-    local_reply = local_handle(text)
+    local_reply = None
+    if intents:
+        with timer.stage("local_handle"):
+            local_reply = await run_in_threadpool(local_handle, text)
     if local_reply:
-        # speak locally and save to persistent memory as before
-        try:
-            speak_kuma(local_reply)
-        except Exception:
-            pass
-        add_memory(f"User: {text}")
-        add_memory(f"Kuma: {local_reply}")
-        # also save to in-memory conversation for session context
-        add_conversation("user", text)
-        add_conversation("assistant", local_reply)
+        # queue speech and save to persistent memory as before
+        if speak:
+            with timer.stage("tts_enqueue"):
+                speak_kuma(local_reply)
+        with timer.stage("memory_write"):
+            remember_turn(text, local_reply, session)
+        requests_total.inc(route="/query", outcome="local")
         return {"reply": local_reply}
 
-    # -----------------------------
-    # Build prompt with context:
-    # - System personality prompt (same as before)
-    # - Recent persistent memories (file-based) appended (optional)
-    # - Recent in-memory conversation_history for session context
-    # -----------------------------
-    recent_mem = get_recent_memory()
-    mem_text = ""
-    if recent_mem:
-        mem_text = "\nRecent memories:\n" + "\n".join([f"- {m['text']}" for m in recent_mem])
-
-    system_prompt = (
-        "You are Kuma — a loyal pirate AI assistant aboard the Thousand Sunny. "
-        "You are cheerful, helpful, and always call the user 'Captain'. "
-        "Keep replies short, witty, and natural like a friend at sea."
-    )
-    if mem_text:
-        system_prompt += "\n\n" + mem_text
-
-    # Build messages list: system + recent conversation (in-memory)
-    messages = [{"role": "system", "content": system_prompt}]
-
-    # Include session conversation history to preserve context
-    for item in conversation_history:
-        # conversation_history entries use 'role' keys 'user'/'assistant'
-        messages.append({"role": item["role"], "content": item["content"]})
-
-    # Finally append the new user message
-    messages.append({"role": "user", "content": text})
-
-    # Call OpenAI Chat Completion using current client (existing logic)
+    with timer.stage("recall"):
+        relevant = await run_in_threadpool(get_relevant_memory, text)
+
+    with timer.stage("cache_lookup"):
+        cache_key, hit = cached_reply(text, session, relevant, bypass=no_cache or not intents)
+    if hit:
+        if speak:
+            with timer.stage("tts_enqueue"):
+                speak_kuma(hit)
+        with timer.stage("memory_write"):
+            remember_turn(text, hit, session)
+        requests_total.inc(route="/query", outcome="cached")
+        return {"reply": hit, "cached": True}
+
+    with timer.stage("prompt"):
+        messages = build_messages(text, session, relevant)
+
+    # Call OpenAI Chat Completion through the shared async client;
+    # {"request_id": ...} lets the client stop it via /query/cancel
+    turn = inflight.start(data.get("request_id"))
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.5,
-            max_tokens=180
-        )
-        reply = response.choices[0].message.content.strip()
-
-        # Speak the reply (same as before)
-        try:
-            speak_kuma(reply)
-        except Exception:
-            pass
-
-        # Persist memory (same as before)
-        add_memory(f"User: {text}")
-        add_memory(f"Kuma: {reply}")
-
-        # Add to in-memory conversation for future context
-        add_conversation("user", text)
-        add_conversation("assistant", reply)
-
+        with timer.stage("llm"):
+            reply = await until_cancelled(llm.complete(
+                messages,
+                timeout=timeout,
+                model=MODEL,
+                temperature=0.5,
+                max_tokens=180
+            ), turn.cancelled)
+        if cache_key and reply:
+            response_cache.set(cache_key, reply)
+
+        # Speak the reply in the background; the response does not wait for it
+        if speak:
+            with timer.stage("tts_enqueue"):
+                speak_kuma(reply)
+
+        # Persist memory and session context
+        with timer.stage("memory_write"):
+            remember_turn(text, reply, session, memory=intents)
+
+        requests_total.inc(route="/query", outcome="llm")
         return {"reply": reply}
 
+    except RequestCancelled:
+        requests_total.inc(route="/query", outcome="cancelled")
+        return {"reply": "", "cancelled": True}
+
     except Exception as e:
         traceback.print_exc()
-        fallback = local_handle(text)
+        fallback = await run_in_threadpool(local_handle, text) if intents else None
         if fallback:
-            try:
+            if speak:
                 speak_kuma(fallback)
-            except Exception:
-                pass
             # keep behavior consistent with older code
-            add_memory(f"User: {text}")
-            add_memory(f"Kuma: {fallback}")
-            add_conversation("user", text)
-            add_conversation("assistant", fallback)
+            remember_turn(text, fallback, session)
+            requests_total.inc(route="/query", outcome="fallback")
             return {"reply": fallback}
+        requests_total.inc(route="/query", outcome="error")
         return {"reply": f"Error contacting AI: {e}"}
+
+    finally:
+        inflight.release(turn)
+
+
+@app.post("/query/stream")
+async def query_stream(request: Request):
+    """Streaming variant of /query: replies arrive sentence by sentence as
+    Server-Sent Events so clients can start speaking before the model is done.
+    Speech is left to the client; memory is saved when the stream ends
+    (or, for a speculative request, when the client commits it)."""
+    data = await request.json()
+    text = data.get("text", "").strip()
+    session = sessions.get(data.get("session_id"))
+    try:
+        timeout = parse_timeout(data.get("timeout"))
+    except ValueError:
+        return bad_timeout("/query/stream")
+
+    if not text:
+        def empty():
+            reply = "I didn’t hear anything, Captain. Can you repeat that?"
+            yield sse_event({"type": "sentence", "text": reply})
+            yield sse_event({"type": "done", "reply": reply})
+        return StreamingResponse(empty(), media_type="text/event-stream")
+
+    # {"request_id": ...} makes the request cancellable; {"speculative": true}
+    # (from a partial transcript) also holds its memory write until commit
+    turn = inflight.start(data.get("request_id"), speculative=data.get("speculative", False))
+    return StreamingResponse(
+        stream_reply(text, session, request.state.timer, turn,
+                     timeout=timeout, no_cache=data.get("no_cache", False)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/query/cancel")
+async def api_cancel_query(request: Request):
+    """Withdraw a request by its request_id; its model call is stopped."""
+    data = await request.json()
+    return {"cancelled": inflight.cancel(data.get("request_id"))}
+
+@app.post("/query/commit")
+async def api_commit_query(request: Request):
+    """Confirm a speculative request: its turn is remembered like any other."""
+    data = await request.json()
+    return {"committed": inflight.commit(data.get("request_id"))}
@@ -0,0 +1,175 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+# ============================================================
+# 🔎 Semantic Memory Index
+# ============================================================
+# One embedding per memory, stored row by row in a single contiguous
+# float32 matrix. Recall is one matrix-vector product (cosine similarity,
+# since every row is unit length) followed by an argpartition for top-k.
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by do for from has have i in is it its me my "
+    "of on or so that the this to was we what when where which who will with "
+    "you your user kuma captain".split()
+)
+
+
+class HashingEmbedder:
+    """Deterministic, offline embedder (feature hashing).
+
+    Words and word bigrams are hashed with crc32 into `dim` buckets with a
+    hash-derived sign, then the vector is L2-normalised. No model, no
+    network, and the same text always maps to the same vector.
+    """
+
+    remote = False
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def features(self, text):
+        words = [w.strip("'") for w in TOKEN_RE.findall(text.lower())]
+        words = [w for w in words if w and w not in STOPWORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            feats = self.features(text)
+            if not feats:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats),
+                                 dtype=np.uint32, count=len(feats))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API (better recall, needs the network).
+
+    Blocking: call it off the event loop.
+    """
+
+    remote = True
+
+    def __init__(self, client, model="text-embedding-3-small", dim=256):
+        self.client = client
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+
+    def embed(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        response = self.client.embeddings.create(model=self.model, input=list(texts),
+                                                 dimensions=self.dim)
+        out = np.asarray([d.embedding for d in response.data], dtype=np.float32)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+class MemoryIndex:
+    """Top-k semantic recall over memory entries.
+
+    Rows are appended into a preallocated matrix that doubles when full;
+    once more than `max_items` are held the oldest rows are dropped.
+    With the hashing embedder a query has only a few non-zero dims, so a
+    search over 100k memories reads a few MB instead of the whole matrix.
+
+    With a vector_store (see MemoryStore.vectors/save_vectors), vectors of
+    entries that carry an "id" are looked up there first and new ones are
+    saved, so rebuilding the index only embeds what was never embedded.
+    """
+
+    def __init__(self, embedder, max_items=100_000, initial_capacity=1024, vector_store=None):
+        self.embedder = embedder
+        self.max_items = max_items
+        self.vector_store = vector_store
+        self.lock = threading.Lock()
+        # column-major: a sparse query only has to read its non-zero columns
+        self.matrix = np.zeros((initial_capacity, embedder.dim), dtype=np.float32, order="F")
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entries):
+        """Index memory entries ({"text": ..., "time": ...} dicts)."""
+        entries = list(entries)
+        if not entries:
+            return
+        vectors = self._vectors(entries)
+        with self.lock:
+            n = len(self.entries)
+            needed = n + len(entries)
+            if needed > self.matrix.shape[0]:
+                capacity = max(needed, 2 * self.matrix.shape[0])
+                grown = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32, order="F")
+                grown[:n] = self.matrix[:n]
+                self.matrix = grown
+            self.matrix[n:needed] = vectors
+            self.entries.extend(entries)
+            if needed > self.max_items:
+                drop = needed - self.max_items
+                self.matrix[:self.max_items] = self.matrix[drop:needed]
+                del self.entries[:drop]
+
+    def _vectors(self, entries):
+        store = self.vector_store
+        if store is None or any(e.get("id") is None for e in entries):
+            return self.embedder.embed([e["text"] for e in entries])
+        stored = store.vectors(self.embedder.name, [e["id"] for e in entries])
+        out = np.zeros((len(entries), self.embedder.dim), dtype=np.float32)
+        missing = []
+        for row, e in enumerate(entries):
+            vector = stored.get(e["id"])
+            if vector is None:
+                missing.append(row)
+            else:
+                out[row] = np.frombuffer(vector, dtype=np.float32)
+        if missing:
+            out[missing] = self.embedder.embed([entries[row]["text"] for row in missing])
+            store.save_vectors(self.embedder.name, [(entries[row]["id"], out[row].tobytes()) for row in missing])
+        return out
+
+    def rebuild(self, entries, batch_size=2048):
+        self.clear()
+        entries = list(entries)
+        for start in range(0, len(entries), batch_size):
+            self.add(entries[start:start + batch_size])
+
+    def clear(self):
+        with self.lock:
+            self.entries = []
+
+    def search(self, query, k=5, min_score=0.3):
+        """Return up to k (score, entry) pairs, best first."""
+        q = self.embedder.embed([query])[0]
+        if not q.any():
+            return []
+        with self.lock:
+            n = len(self.entries)
+            if n == 0:
+                return []
+            nz = np.flatnonzero(q)
+            if len(nz) * 4 < len(q):
+                # hashed queries touch a handful of dims: gather just those columns
+                scores = self.matrix[:n, nz] @ q[nz]
+            else:
+                scores = self.matrix[:n] @ q
+            # most rows share nothing with the query; rank only the ones that do
+            candidates = np.flatnonzero(scores >= min_score)
+            if len(candidates) > k:
+                part = np.argpartition(scores[candidates], len(candidates) - k)
+                candidates = candidates[part[len(candidates) - k:]]
+            top = candidates[np.argsort(scores[candidates])[::-1]]
+            return [(float(scores[i]), self.entries[i]) for i in top]
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+# ============================================================
+# 📂 Memory Store (SQLite, WAL mode)
+# ============================================================
+# Memories are appended as rows instead of rewriting a JSON file per
+# entry. The retained window is mirrored in an in-process deque, so reads
+# never touch disk, and old rows are trimmed by a background compactor.
+# Embeddings that cost an API call are kept alongside, one row per memory
+# and embedder, so a restart doesn't have to compute them again.
+
+
+class MemoryStore:
+    def __init__(self, path="memory.db", retention=50, legacy_json=None):
+        self.path = path
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.cache = deque(maxlen=retention)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " text TEXT NOT NULL,"
+            " time TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding ("
+            " memory_id INTEGER NOT NULL,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (memory_id, model))"
+        )
+        if legacy_json:
+            self.import_json(legacy_json)
+        self._load_cache()
+        self._compactor = None
+        self._stop = threading.Event()
+
+    # ---------- reads (served from the cache) ----------
+    def all(self):
+        with self.lock:
+            return list(self.cache)
+
+    def recent(self, n):
+        if n <= 0:
+            return []
+        with self.lock:
+            return list(islice(reversed(self.cache), n))[::-1]
+
+    # ---------- writes ----------
+    def add(self, text: str):
+        return self.add_many([text])[0]
+
+    def add_many(self, texts):
+        """Append several memories in a single transaction (one fsync)."""
+        now = datetime.now().isoformat()
+        entries = [{"id": None, "text": t, "time": now} for t in texts]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                for e in entries:
+                    e["id"] = self.conn.execute(
+                        "INSERT INTO memory (text, time) VALUES (?, ?)", (e["text"], e["time"])
+                    ).lastrowid
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.cache.extend(entries)
+        return entries
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM memory")
+            self.conn.execute("DELETE FROM embedding")
+            self.cache.clear()
+
+    # ---------- embeddings ----------
+    def vectors(self, model, ids, chunk=500):
+        """{memory id: vector bytes} of the ids that have one stored for model."""
+        ids = list(ids)
+        found = {}
+        with self.lock:
+            for start in range(0, len(ids), chunk):
+                part = ids[start:start + chunk]
+                rows = self.conn.execute(
+                    f"SELECT memory_id, vector FROM embedding WHERE model = ? "
+                    f"AND memory_id IN ({','.join('?' * len(part))})", (model, *part)
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def save_vectors(self, model, vectors):
+        """Store (memory id, vector bytes) pairs for model."""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embedding (memory_id, model, vector) VALUES (?, ?, ?)",
+                [(memory_id, model, vector) for memory_id, vector in vectors],
+            )
+
+    # ---------- maintenance ----------
+    def compact(self):
+        """Drop rows that fell out of the retention window and checkpoint the WAL."""
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM memory WHERE id <= (SELECT MAX(id) FROM memory) - ?",
+                (self.retention,),
+            )
+            self.conn.execute("DELETE FROM embedding WHERE memory_id NOT IN (SELECT id FROM memory)")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def start_compactor(self, interval=300.0):
+        if self._compactor and self._compactor.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"📂 [Memory compaction error]: {e}")
+
+        self._compactor = threading.Thread(target=run, name="kuma-memory-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        with self.lock:
+            self.conn.close()
+
+    def import_json(self, json_path):
+        """One-time import of a legacy memory.json; the file is renamed afterwards."""
+        if not os.path.exists(json_path):
+            return 0
+        with self.lock:
+            (count,) = self.conn.execute("SELECT COUNT(*) FROM memory").fetchone()
+        if count:
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            return 0
+        rows = [(m["text"], m.get("time") or datetime.now().isoformat())
+                for m in legacy if isinstance(m, dict) and m.get("text")]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT INTO memory (text, time) VALUES (?, ?)", rows)
+            self.conn.execute("COMMIT")
+        os.replace(json_path, json_path + ".imported")
+        return len(rows)
+
+    def _load_cache(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, text, time FROM memory ORDER BY id DESC LIMIT ?", (self.retention,)
+            ).fetchall()
+            self.cache.clear()
+            self.cache.extend({"id": id_, "text": text, "time": time} for id_, text, time in reversed(rows))
@@ -0,0 +1,172 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================================================
+# 📊 Metrics
+# ============================================================
+# Minimal Prometheus text-format metrics (counters, histograms and values
+# read at scrape time) plus a per-request StageTimer that feeds the stage
+# histogram and renders a Server-Timing header.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _fmt(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, _labels(self.labelnames, k), v) for k, v in sorted(self.values.items())]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        out = []
+        with self.lock:
+            items = sorted((k, list(v)) for k, v in self.series.items())
+        for key, series in items:
+            names = self.labelnames + ("le",)
+            for bound, count in zip(self.buckets, series):
+                out.append((f"{self.name}_bucket", _labels(names, key + (_fmt(bound),)), count))
+            out.append((f"{self.name}_bucket", _labels(names, key + ("+Inf",)), series[-1]))
+            out.append((f"{self.name}_sum", _labels(self.labelnames, key), round(series[-2], 6)))
+            out.append((f"{self.name}_count", _labels(self.labelnames, key), series[-1]))
+        return out
+
+
+class Observed:
+    """A gauge or counter whose value is read from fn() at scrape time.
+    fn returns a number, or a dict of {label value: number}."""
+
+    def __init__(self, name, help, fn, type="gauge", labelname=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.type = type
+        self.labelname = labelname
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            return [(self.name, _labels((self.labelname,), (k,)), v) for k, v in value.items()]
+        return [(self.name, "", value)]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def observe(self, name, help, fn, type="gauge", labelname=None):
+        return self.register(Observed(name, help, fn, type, labelname))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Times the stages of one request.
+
+    Each finished stage is observed into the stage histogram and kept for
+    the Server-Timing header (durations in milliseconds).
+    """
+
+    def __init__(self, histogram=None):
+        self.histogram = histogram
+        self.stages = []  # (name, seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds, observe=True):
+        self.stages.append((name, seconds))
+        if observe and self.histogram is not None:
+            self.histogram.observe(seconds, stage=name)
+
+    def as_dict(self):
+        totals = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return {name: round(seconds * 1000, 2) for name, seconds in totals.items()}
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
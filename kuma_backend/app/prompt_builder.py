@@ -0,0 +1,141 @@
+import math
+
+# ============================================================
+# 🧩 Prompt Builder
+# ============================================================
+# Fits the persona, memories, session history and the user's text into a
+# token budget, trimming by priority:
+#
+#   system prompt  >  conversation summary  >  user text (capped)
+#                  >  related memories  >  history (newest first)
+#                  >  recent memories
+#
+# The layout keeps a byte-stable prefix so provider-side prompt caching can
+# hit: the static persona comes first, then the conversation summary and
+# history, which only grows at the end between compactions. Everything
+# that changes per request (memories, the user text) goes after it, and
+# when history must be trimmed it is cut at fixed block boundaries so the
+# first kept message stays the same across many turns.
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character estimate
+    tiktoken = None
+
+MESSAGE_OVERHEAD = 4  # role/framing tokens per chat message
+TRUNCATION_MARK = " …[truncated]"
+
+
+class TokenCounter:
+    """Counts tokens locally: tiktoken when installed, else ~4 chars/token."""
+
+    def __init__(self, model="gpt-4o-mini"):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return math.ceil(len(text) / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count(text) <= max_tokens:
+            return text
+        keep = max(max_tokens - self.count(TRUNCATION_MARK), 0)
+        if self.encoding is not None:
+            head = self.encoding.decode(self.encoding.encode(text)[:keep])
+        else:
+            head = text[:keep * 4]
+        return head + TRUNCATION_MARK
+
+    def message(self, message: dict) -> int:
+        return self.count(message["content"]) + MESSAGE_OVERHEAD
+
+
+class PromptBuilder:
+    def __init__(self, system_prompt, counter, budget=3000, max_user_share=0.5, history_block=8):
+        self.system_prompt = system_prompt
+        self.counter = counter
+        self.budget = budget
+        self.max_user_share = max_user_share
+        self.history_block = history_block
+
+    def build(self, text, history=(), first_index=0, recent_memories=(), related_memories=(),
+              summary=""):
+        """Chat messages for one request, within the token budget.
+
+        history is the session's messages; first_index is the absolute turn
+        number of history[0], used to cut history at stable boundaries.
+        summary (of older, compacted turns) follows the persona; it only
+        changes when a compaction runs, so the prefix stays cacheable.
+        """
+        system = {"role": "system", "content": self.system_prompt}
+        left = self.budget - self.counter.message(system)
+        head = [system]
+        if summary:
+            summary_text = self.counter.truncate(summary, max(left // 4, 0))
+            head.append({"role": "system", "content": f"Earlier in this conversation:\n{summary_text}"})
+            left -= self.counter.message(head[-1])
+
+        user_text = self.counter.truncate(text, int(self.budget * self.max_user_share))
+        user = {"role": "user", "content": user_text}
+        left -= self.counter.message(user)
+
+        # memories share one message; related ones are worth more than recent
+        related = self._fit_lines(related_memories, left - MESSAGE_OVERHEAD)
+        left -= self._lines_cost(related)
+        history = self._fit_history(list(history), first_index, left - MESSAGE_OVERHEAD)
+        left -= sum(self.counter.message(m) for m in history)
+        related_texts = set(related)
+        recent = self._fit_lines([m for m in recent_memories if m not in related_texts],
+                                 left - MESSAGE_OVERHEAD)
+
+        messages = head + history
+        sections = []
+        if recent:
+            sections.append("Recent memories:\n" + "\n".join(f"- {m}" for m in recent))
+        if related:
+            sections.append("Related memories:\n" + "\n".join(f"- {m}" for m in related))
+        if sections:
+            messages.append({"role": "system", "content": "\n\n".join(sections)})
+        messages.append(user)
+        return messages
+
+    def count(self, messages):
+        return sum(self.counter.message(m) for m in messages)
+
+    def _lines_cost(self, lines):
+        return sum(self.counter.count(line) + 2 for line in lines) + (MESSAGE_OVERHEAD if lines else 0)
+
+    def _fit_lines(self, lines, budget):
+        kept = []
+        for line in lines:
+            cost = self.counter.count(line) + 2
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        return kept
+
+    def _fit_history(self, history, first_index, budget):
+        """Drop the oldest messages until the rest fits, cutting only at block
+        boundaries (absolute message numbers that are multiples of
+        history_block), so the first kept message stays the same for
+        several turns in a row instead of shifting every turn."""
+        costs = [self.counter.message(m) for m in history]
+        block = self.history_block
+        start = 0
+        total = sum(costs)
+        while total > budget and start < len(history):
+            absolute = first_index + start
+            next_cut = min((absolute // block + 1) * block - first_index, len(history))
+            total -= sum(costs[start:next_cut])
+            start = next_cut
+        # a user/assistant pair should not be split at the front
+        if start < len(history) and history[start]["role"] == "assistant":
+            start += 1
+        return history[start:]
@@ -0,0 +1,88 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ============================================================
+# 💾 Response Cache
+# ============================================================
+# Voice users repeat themselves ("how are you", "tell me something fun").
+# Replies are cached under a normalised prompt plus a fingerprint of the
+# context that shaped the answer, with a TTL and size-bounded LRU eviction.
+
+PUNCT_RE = re.compile(r"[^\w\s']")
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """'How are you, Kuma?!' and 'how are you kuma' share one cache entry."""
+    text = text.lower().replace("’", "'")
+    text = PUNCT_RE.sub(" ", text)
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def fingerprint(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, max_items=512, ttl=3600.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.items = OrderedDict()  # key -> (expires_at, reply)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(text: str, context: str = "") -> str:
+        return f"{context}:{normalize_prompt(text)}"
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, reply = item
+            if expires_at < time.monotonic():
+                del self.items[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return reply
+
+    def set(self, key, reply):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, reply)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.items),
+                "max_items": self.max_items,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+# ============================================================
+# 💬 Conversation Sessions
+# ============================================================
+# Each client sends a session id and gets its own conversation window.
+# Live sessions are kept in an LRU: idle ones expire, and the least
+# recently used are dropped when there are too many or they hold too much
+# text in total. Every session has its own lock, so concurrent requests
+# on one session can't corrupt its history.
+
+DEFAULT_SESSION = "default"
+
+
+class Session:
+    def __init__(self, session_id, max_turns):
+        self.id = session_id
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=max_turns)  # {"role", "content", "time"}
+        self.size = 0  # characters held in history
+        self.appended = 0  # messages ever added; history[0] is number appended - len(history)
+        self.summary = ""  # running summary of messages folded out of history
+        self.created = time.monotonic()
+        self.last_seen = self.created
+
+    def _append(self, role, content):
+        if len(self.history) == self.history.maxlen:
+            self.size -= len(self.history[0]["content"])
+        self.history.append({"role": role, "content": content, "time": datetime.now().isoformat()})
+        self.size += len(content)
+        self.appended += 1
+
+    def add(self, role: str, content: str):
+        with self.lock:
+            self._append(role, content)
+
+    def add_turn(self, user_text: str, reply: str):
+        """Append a user/assistant pair atomically."""
+        with self.lock:
+            self._append("user", user_text)
+            self._append("assistant", reply)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.history)
+
+    def window(self):
+        """(summary, absolute index of the first message, messages) as one snapshot."""
+        with self.lock:
+            return self.summary, self.appended - len(self.history), list(self.history)
+
+    def fold(self, first_index, count, summary):
+        """Replace the first count messages with summary, provided history
+        still starts at first_index (i.e. nothing moved since the snapshot)."""
+        with self.lock:
+            if self.appended - len(self.history) != first_index or count > len(self.history):
+                return False
+            for _ in range(count):
+                self.size -= len(self.history.popleft()["content"])
+            self.summary = summary
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.history.clear()
+            self.size = 0
+            self.summary = ""
+
+
+class SessionStore:
+    def __init__(self, max_turns=12, max_sessions=256, idle_ttl=3600.0, max_chars=2_000_000):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_chars = max_chars
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # least recently used first
+
+    def get(self, session_id=None):
+        """The session for session_id (created on first use), marked as used."""
+        session_id = session_id or DEFAULT_SESSION
+        with self.lock:
+            self._expire()
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = Session(session_id, self.max_turns)
+            session.last_seen = time.monotonic()
+            self.sessions.move_to_end(session_id)
+            self._enforce_limits()
+            return session
+
+    def peek(self, session_id=None):
+        """The session if it is live, without creating or touching it."""
+        with self.lock:
+            return self.sessions.get(session_id or DEFAULT_SESSION)
+
+    def drop(self, session_id=None):
+        with self.lock:
+            return self.sessions.pop(session_id or DEFAULT_SESSION, None) is not None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self.sessions),
+                "chars": sum(s.size for s in self.sessions.values()),
+                "max_sessions": self.max_sessions,
+                "idle_ttl": self.idle_ttl,
+            }
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if oldest.last_seen >= cutoff:
+                break
+            self.sessions.popitem(last=False)
+
+    def _enforce_limits(self):
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        total = sum(s.size for s in self.sessions.values())
+        # never evict the session that was just used
+        while total > self.max_chars and len(self.sessions) > 1:
+            _, evicted = self.sessions.popitem(last=False)
+            total -= evicted.size
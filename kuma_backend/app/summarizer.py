@@ -0,0 +1,113 @@
+import asyncio
+import re
+import traceback
+
+# ============================================================
+# 📜 Conversation Compaction
+# ============================================================
+# Long voice sessions would otherwise either lose context at a hard cutoff
+# or pay for the whole raw history on every request. Once a session's
+# history grows past a token threshold, its oldest messages are folded
+# into a running summary by a background task, off the request path, and
+# the prompt carries that summary instead of the raw turns.
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between the Captain "
+    "(the user) and Kuma (the assistant). Merge the new messages into the "
+    "existing summary. Keep names, dates, preferences, decisions and open "
+    "requests; drop small talk. Reply with the updated summary only, in at "
+    "most {max_words} words."
+)
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+class LLMSummarizer:
+    """Summarizes with the chat model through the shared LLM client."""
+
+    def __init__(self, llm, model, max_words=120, timeout=20.0):
+        self.llm = llm
+        self.model = model
+        self.max_words = max_words
+        self.timeout = timeout
+
+    async def summarize(self, summary, messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return await self.llm.complete(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT.format(max_words=self.max_words)},
+                {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+            ],
+            timeout=self.timeout,
+            model=self.model,
+            temperature=0.2,
+            max_tokens=self.max_words * 2,
+        )
+
+
+class ExtractiveSummarizer:
+    """Local, deterministic stand-in: keeps the first sentence of each
+    message and the newest lines that fit in max_chars. No network."""
+
+    def __init__(self, max_chars=800):
+        self.max_chars = max_chars
+
+    async def summarize(self, summary, messages):
+        lines = summary.splitlines() if summary else []
+        for m in messages:
+            first = SENTENCE_RE.split(m["content"].strip(), maxsplit=1)[0]
+            who = "Captain" if m["role"] == "user" else "Kuma"
+            lines.append(f"{who}: {first}")
+        while lines and sum(len(line) + 1 for line in lines) > self.max_chars:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+class ConversationCompactor:
+    def __init__(self, summarizer, counter, trigger_tokens=1200, keep_recent=8):
+        self.summarizer = summarizer
+        self.counter = counter
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent = keep_recent
+        self.running = set()  # session ids being compacted
+        self.tasks = set()    # strong refs so tasks aren't garbage collected
+        self.compactions = 0
+        self.failures = 0
+
+    def needs_compaction(self, session):
+        _, _, history = session.window()
+        if len(history) <= self.keep_recent:
+            return False
+        return sum(self.counter.count(m["content"]) for m in history) > self.trigger_tokens
+
+    def maybe_schedule(self, session):
+        """Start a background compaction of session if it is over threshold.
+        Must be called from the event loop thread."""
+        if session.id in self.running or not self.needs_compaction(session):
+            return None
+        self.running.add(session.id)
+        task = asyncio.get_running_loop().create_task(self.compact(session))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def compact(self, session):
+        try:
+            summary, first_index, history = session.window()
+            # keep recent messages raw; start the kept part on a user message
+            cut = len(history) - self.keep_recent
+            while cut < len(history) and history[cut]["role"] == "assistant":
+                cut += 1
+            if cut <= 0:
+                return False
+            new_summary = await self.summarizer.summarize(summary, history[:cut])
+            if session.fold(first_index, cut, new_summary.strip()):
+                self.compactions += 1
+                return True
+            return False
+        except Exception:
+            self.failures += 1
+            traceback.print_exc()
+            return False
+        finally:
+            self.running.discard(session.id)
@@ -0,0 +1,99 @@
+import queue
+import threading
+import traceback
+
+# ============================================================
+# 🔊 Background TTS Worker
+# ============================================================
+# Speech synthesis and playback are slow and blocking, so they run on a
+# single daemon thread fed by a bounded queue. Request handlers only
+# enqueue text and return immediately.
+
+
+class TTSWorker:
+    """Speak queued utterances one at a time on a background thread.
+
+    synthesize(text) returns something playable, play(audio) blocks until
+    it has been played. When the queue is full the oldest utterance is
+    dropped, and cancel() discards everything queued before it, so Kuma
+    never drifts behind the conversation reading out stale replies.
+    """
+
+    def __init__(self, synthesize, play, max_queue=4):
+        self.synthesize = synthesize
+        self.play = play
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="kuma-tts", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self.cancel()
+        self._put(None)
+        if self.thread:
+            self.thread.join(timeout)
+
+    def cancel(self):
+        """Drop every utterance queued so far (including one being synthesized)."""
+        with self.lock:
+            self.generation += 1
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def say(self, text: str, interrupt: bool = False):
+        """Queue text to be spoken. interrupt=True cancels older utterances first."""
+        if not text or not text.strip():
+            return False
+        if interrupt:
+            self.cancel()
+        with self.lock:
+            generation = self.generation
+        self._put((generation, text))
+        return True
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _put(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()  # drop the stalest utterance
+                except queue.Empty:
+                    pass
+
+    def _is_stale(self, generation):
+        with self.lock:
+            return generation != self.generation
+
+    def _run(self):
+        while self.running:
+            item = self.queue.get()
+            if item is None:
+                continue
+            generation, text = item
+            if self._is_stale(generation):
+                continue
+            try:
+                audio = self.synthesize(text)
+                # a newer utterance may have cancelled this one while synthesizing
+                if audio is not None and not self._is_stale(generation):
+                    self.play(audio)
+            except Exception as e:
+                print(f"🎧 [Voice Error]: {e}")
+                traceback.print_exc()
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import requests
+
+# ============================================================
+# 🌦️ Weather Provider
+# ============================================================
+# Geolocation and forecast are each cached with a TTL and refreshed in the
+# background shortly before they expire. Past the TTL, a value younger
+# than max_stale is still answered at once while a background refresh
+# fetches the new one; a caller only waits on the upstream when there is
+# nothing usable cached. Concurrent lookups of the same key share one
+# upstream call (single flight), and when the upstream is slow or down
+# the last good value is served instead of an error.
+#
+# No package-relative imports: the voice client loads this file directly.
+
+WTTR_URL = "https://wttr.in/?format=3"
+
+
+def locate_by_ip(timeout=3.0):
+    import geocoder
+    g = geocoder.ip("me", timeout=timeout)
+    return g.city or g.state
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class WeatherProvider:
+    def __init__(self, weather_url=WTTR_URL, locate=None, timeout=3.0,
+                 forecast_ttl=600.0, location_ttl=6 * 3600.0,
+                 refresh_ahead=60.0, max_stale=6 * 3600.0):
+        self.weather_url = weather_url
+        self.locate = locate or (lambda: locate_by_ip(timeout))
+        self.timeout = timeout
+        self.ttls = {"forecast": forecast_ttl, "location": location_ttl}
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+        self.lock = threading.Lock()
+        self.cache = {}     # key -> (value, fetched_at)
+        self.calls = {}     # key -> _Call in flight
+        self.refreshing = set()
+        self.session = requests.Session()
+
+    # ---------- upstream fetchers ----------
+    def _fetch_location(self):
+        return self.locate()
+
+    def _fetch_forecast(self):
+        resp = self.session.get(self.weather_url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.text.strip()
+
+    # ---------- caching machinery ----------
+    def _single_flight(self, key, fetch):
+        """Run fetch once for all concurrent callers asking for key."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error:
+                raise call.error
+            return call.value
+        try:
+            call.value = fetch()
+            with self.lock:
+                self.cache[key] = (call.value, time.monotonic())
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+    def _refresh_in_background(self, key, fetch):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                self._single_flight(key, fetch)
+            except Exception as e:
+                print(f"🌦️ [Weather refresh failed]: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"kuma-weather-{key}", daemon=True).start()
+
+    def _get(self, key, fetch):
+        ttl = self.ttls[key]
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached:
+            value, fetched_at = cached
+            age = time.monotonic() - fetched_at
+            if age < ttl:
+                if age > ttl - self.refresh_ahead:
+                    self._refresh_in_background(key, fetch)
+                return value
+            if age < self.max_stale:
+                # expired but usable: answer now, fetch the new value off the caller's path
+                self._refresh_in_background(key, fetch)
+                return value
+        return self._single_flight(key, fetch)
+
+    # ---------- public API ----------
+    def city(self):
+        try:
+            return self._get("location", self._fetch_location) or "your area"
+        except Exception:
+            return "your area"
+
+    def forecast(self):
+        """Forecast text, or None when no fresh or stale value is available."""
+        try:
+            return self._get("forecast", self._fetch_forecast)
+        except Exception:
+            return None
+
+    def prefetch(self):
+        """Warm both caches in the background (e.g. at startup)."""
+        self._refresh_in_background("location", self._fetch_location)
+        self._refresh_in_background("forecast", self._fetch_forecast)
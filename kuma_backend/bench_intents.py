@@ -0,0 +1,68 @@
+# bench_intents.py
+"""
+Micro-benchmark: per-utterance cost of the compiled intent matcher as the
+number of intents grows, next to the old style of one `in` check per phrase.
+
+Run from kuma_backend/:
+    python bench_intents.py
+"""
+import random
+import time
+
+from app.intents import Intent, IntentMatcher
+
+SIZES = [25, 100, 250, 500, 1000]
+UTTERANCES = 2000
+VERBS = ["open", "play", "show", "start", "launch", "check", "find", "read"]
+
+
+def make_intents(n, rng):
+    intents = []
+    for i in range(n):
+        verb = rng.choice(VERBS)
+        intents.append(Intent(f"intent_{i}", [f"{verb} thing{i}", f"{verb} the thing{i} now"], "reply"))
+    return intents
+
+
+def make_utterances(intents, rng):
+    filler = "hey kuma could you please maybe go and do something for me".split()
+    utterances = []
+    for _ in range(UTTERANCES):
+        words = rng.sample(filler, 8)
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words)), rng.choice(rng.choice(intents).phrases))
+        utterances.append(" ".join(words))
+    return utterances
+
+
+def linear_match(intents, text):
+    """What local_handle used to do: one substring test per phrase, in order."""
+    t = text.lower()
+    for intent in intents:
+        for phrase in intent.phrases:
+            if phrase in t:
+                return intent
+    return None
+
+
+def per_call_us(fn, utterances):
+    start = time.perf_counter()
+    for u in utterances:
+        fn(u)
+    return (time.perf_counter() - start) / len(utterances) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'intents':>8} {'compiled µs':>12} {'linear µs':>10}")
+    for n in SIZES:
+        intents = make_intents(n, rng)
+        matcher = IntentMatcher(intents)
+        utterances = make_utterances(intents, rng)
+        compiled = per_call_us(matcher.match, utterances)
+        linear = per_call_us(lambda u: linear_match(intents, u), utterances)
+        print(f"{n:>8} {compiled:>12.1f} {linear:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# bench_load.py
+"""
+Load test for the backend: starts the FastAPI app against the stub OpenAI
+server (stub_openai.py) with a stub TTS, drives a mixed workload at each
+concurrency level and reports throughput and p50/p95/p99 latency per route.
+Results are written as JSON so runs can be compared for regressions.
+
+Run from kuma_backend/:
+    python bench_load.py                                  # defaults
+    python bench_load.py -c 1 8 32 -n 400 --llm-latency 0.5
+    python bench_load.py --out bench_results/after.json --compare bench_results/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LOCAL_PROMPTS = ["what time is it", "what's the date today", "tell me a joke"]
+LLM_PROMPTS = [
+    "how are you today", "tell me something fun about the sea",
+    "what should I cook tonight", "give me a pirate motto", "how do sails work",
+]
+
+# name -> (method, path, body factory)
+ROUTES = {
+    "local": ("POST", "/query", lambda rng, sid: {"text": rng.choice(LOCAL_PROMPTS), "session_id": sid}),
+    "llm": ("POST", "/query", lambda rng, sid: {"text": rng.choice(LLM_PROMPTS), "session_id": sid, "no_cache": True}),
+    "stream": ("POST", "/query/stream", lambda rng, sid: {"text": rng.choice(LLM_PROMPTS), "session_id": sid, "no_cache": True}),
+    "memory": ("GET", "/memory", None),
+}
+
+
+# ============================================================
+# 🚀 Servers
+# ============================================================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start_servers(args, workdir):
+    stub_port, backend_port = free_port(), free_port()
+    stub_env = dict(os.environ, STUB_LATENCY=str(args.llm_latency),
+                    STUB_TOKEN_DELAY=str(args.token_delay))
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "stub_openai:app", "--port", str(stub_port), "--log-level", "warning"],
+        cwd=HERE, env=stub_env,
+    )
+    backend_env = dict(
+        os.environ,
+        OPENAI_API_KEY="stub",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1",
+        WEATHER_URL=f"http://127.0.0.1:{stub_port}/weather",
+        MEMORY_DB=os.path.join(workdir, "memory.db"),
+        SUMMARIZER="extractive",
+        # no TTS calls against the stub, and no writes to the user's audio cache
+        TTS_PREWARM="0",
+        KUMA_TTS_CACHE_DIR=os.path.join(workdir, "tts_cache"),
+        PYTHONPATH=HERE,
+    )
+    backend = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve-backend", str(backend_port),
+         "--tts-latency", str(args.tts_latency)],
+        cwd=workdir, env=backend_env, stdout=subprocess.DEVNULL,  # keep per-request logs out of the report
+    )
+    wait_until_up(f"http://127.0.0.1:{stub_port}/stats")
+    wait_until_up(f"http://127.0.0.1:{backend_port}/")
+    return [stub, backend], f"http://127.0.0.1:{backend_port}"
+
+
+def serve_backend(port, tts_latency):
+    """Child process: the real app with speech synthesis/playback stubbed."""
+    import uvicorn
+    from app import main
+
+    def synthesize(text):
+        time.sleep(tts_latency)
+        return text
+
+    main.tts_worker.synthesize = synthesize
+    main.tts_worker.play = lambda audio: time.sleep(tts_latency)
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ============================================================
+# 📈 Load generation
+# ============================================================
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def pick_route(rng, mix):
+    names = list(mix)
+    return rng.choices(names, weights=[mix[n] for n in names])[0]
+
+
+async def run_level(base_url, concurrency, total, mix, seed):
+    rng = random.Random(seed)
+    plan = [pick_route(rng, mix) for _ in range(total)]
+    samples = {name: [] for name in mix}
+    errors = {name: 0 for name in mix}
+    cursor = iter(enumerate(plan))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def user(uid):
+            session_id = f"bench-{concurrency}-{uid}"
+            for _, name in cursor:
+                method, path, body = ROUTES[name]
+                start = time.perf_counter()
+                try:
+                    if method == "GET":
+                        resp = await client.get(path)
+                    else:
+                        resp = await client.post(path, json=body(rng, session_id))
+                    if resp.status_code != 200:
+                        errors[name] += 1
+                        continue
+                except httpx.HTTPError:
+                    errors[name] += 1
+                    continue
+                samples[name].append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name, values in samples.items():
+        values.sort()
+        routes[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50), 2) if values else None,
+            "p95_ms": round(percentile(values, 95), 2) if values else None,
+            "p99_ms": round(percentile(values, 99), 2) if values else None,
+        }
+    done = sum(len(v) for v in samples.values())
+    return {"concurrency": concurrency, "requests": done, "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(done / elapsed, 2), "routes": routes}
+
+
+# ============================================================
+# 🧾 Reporting
+# ============================================================
+def print_level(level):
+    print(f"\nconcurrency {level['concurrency']}: {level['requests']} requests in "
+          f"{level['elapsed_s']}s ({level['throughput_rps']} req/s)")
+    print(f"  {'route':<8} {'n':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in level["routes"].items():
+        fmt = lambda v: f"{v:>9.1f}" if v is not None else f"{'-':>9}"
+        print(f"  {name:<8} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>8.1f}"
+              f"{fmt(r['p50_ms'])}{fmt(r['p95_ms'])}{fmt(r['p99_ms'])}")
+
+
+def compare(current, baseline_path, tolerance):
+    """Print p95 changes against an earlier run; returns True if any regressed."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {lvl["concurrency"]: lvl for lvl in baseline["levels"]}
+    regressed = False
+    print(f"\nComparison with {baseline_path} (p95, tolerance {tolerance:.0%}):")
+    for level in current["levels"]:
+        old = before.get(level["concurrency"])
+        if not old:
+            continue
+        for name, r in level["routes"].items():
+            prev = old["routes"].get(name, {}).get("p95_ms")
+            if not prev or r["p95_ms"] is None:
+                continue
+            change = (r["p95_ms"] - prev) / prev
+            flag = "REGRESSION" if change > tolerance else ""
+            regressed = regressed or bool(flag)
+            print(f"  c={level['concurrency']:<4} {name:<8} {prev:>9.1f} -> {r['p95_ms']:>9.1f} ms "
+                  f"({change:+.0%}) {flag}")
+    return regressed
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in ROUTES:
+            raise SystemExit(f"unknown route '{name}' (choose from {', '.join(ROUTES)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kuma backend load test")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--mix", default="local=3,llm=4,stream=2,memory=1",
+                        help="route weights, e.g. local=3,llm=4,stream=2,memory=1")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="stub delay between tokens (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="stub synthesis/playback time (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None, help="results file (default bench_results/load-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95 slowdown before flagging")
+    parser.add_argument("--serve-backend", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_backend:
+        serve_backend(args.serve_backend, args.tts_latency)
+        return
+
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="kuma-bench-")
+    procs, base_url = start_servers(args, workdir)
+    try:
+        results = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {"requests": args.requests, "mix": mix, "llm_latency": args.llm_latency,
+                       "token_delay": args.token_delay, "tts_latency": args.tts_latency, "seed": args.seed},
+            "levels": [],
+        }
+        for concurrency in args.concurrency:
+            level = asyncio.run(run_level(base_url, concurrency, args.requests, mix, args.seed))
+            results["levels"].append(level)
+            print_level(level)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+
+    out = args.out or os.path.join(HERE, "bench_results", f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {out}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# stub_openai.py
+"""
+Tiny OpenAI-compatible server for testing the backend without an API key.
+
+Run it:
+    uvicorn stub_openai:app --port 9000
+
+Then start the backend against it:
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+
+It also answers GET /weather like wttr.in's "?format=3", for WEATHER_URL.
+
+Knobs (environment variables):
+    STUB_LATENCY      seconds before the first token       (default 0.3)
+    STUB_TOKEN_DELAY  seconds between streamed tokens      (default 0.02)
+    STUB_FAIL_RATE    fraction of calls answered with 500  (default 0)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0.3"))
+STUB_TOKEN_DELAY = float(os.getenv("STUB_TOKEN_DELAY", "0.02"))
+STUB_FAIL_RATE = float(os.getenv("STUB_FAIL_RATE", "0"))
+
+REPLY = "Aye aye, Captain! The stub sea is calm today. Ready when you are."
+
+app = FastAPI(title="Stub OpenAI")
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def completion_chunk(completion_id, model, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+@app.get("/weather")
+def weather():
+    return PlainTextResponse("Stub Harbor: ☀️  +21°C")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    stats["requests"] += 1
+
+    if random.random() < STUB_FAIL_RATE:
+        return JSONResponse({"error": {"message": "stub failure", "type": "server_error"}}, status_code=500)
+
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(STUB_LATENCY)
+    except asyncio.CancelledError:
+        stats["in_flight"] -= 1
+        raise
+
+    if not body.get("stream"):
+        stats["in_flight"] -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": REPLY},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    async def events():
+        try:
+            for word in REPLY.split(" "):
+                yield f"data: {json.dumps(completion_chunk(completion_id, model, word + ' '))}\n\n"
+                await asyncio.sleep(STUB_TOKEN_DELAY)
+            yield f"data: {json.dumps(completion_chunk(completion_id, model, finish_reason='stop'))}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
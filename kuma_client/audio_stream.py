@@ -0,0 +1,379 @@
+# audio_stream.py
+"""
+Continuous speech capture for the voice clients.
+
+One long-lived input stream feeds fixed-size frames through a voice
+activity detector; a segmenter with a small ring buffer of pre-roll cuts
+the stream into utterances and queues them. Capture runs on its own
+thread, so recognition and backend calls for one phrase overlap with
+capture of the next, and no speech is lost between listen() calls.
+
+The noise floor adapts continuously, which replaces the one-second
+adjust_for_ambient_noise() pause per utterance. WebRTC VAD is used when
+the optional webrtcvad package is installed, else an energy detector.
+
+Input can also be WAV files, for testing without a microphone:
+    python audio_stream.py recording.wav [more.wav ...]
+"""
+import collections
+import queue
+import sys
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import numpy as np
+import speech_recognition as sr
+
+try:
+    import webrtcvad
+except ImportError:  # optional: fall back to the energy detector
+    webrtcvad = None
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+FRAME_MS = 30
+
+
+# ============================================================
+# 🎙️ Sources
+# ============================================================
+class MicrophoneSource:
+    """A single PyAudio input stream, opened once and read frame by frame."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, device_index=None):
+        self.sample_rate = sample_rate
+        self.sample_width = SAMPLE_WIDTH
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.mic = sr.Microphone(device_index=device_index, sample_rate=sample_rate,
+                                 chunk_size=self.frame_samples)
+        self.stream = None
+
+    def open(self):
+        self.stream = self.mic.__enter__().stream
+
+    def read(self):
+        return self.stream.read(self.frame_samples)
+
+    def close(self):
+        if self.stream is not None:
+            self.mic.__exit__(None, None, None)
+            self.stream = None
+
+
+class WavSource:
+    """Frames from 16-bit WAV files, as if spoken into the microphone.
+
+    Each file is followed by trailing silence so its last phrase ends.
+    With realtime=True frames are paced at the speed they would arrive
+    from a microphone; otherwise the files are read as fast as possible.
+    """
+
+    def __init__(self, paths, frame_ms=FRAME_MS, realtime=False, trailing_silence_ms=1000):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.frame_ms = frame_ms
+        self.realtime = realtime
+        self.trailing_silence_ms = trailing_silence_ms
+        self.sample_width = SAMPLE_WIDTH
+        self.sample_rate = None
+        self.frames = None
+
+    def open(self):
+        # the first file's header decides the rate; the rest must match it
+        self.sample_rate = self._rate(self.paths[0]) if self.paths else SAMPLE_RATE
+        self.frames = self._frames()
+
+    def read(self):
+        """Next frame of PCM bytes, or b"" at the end of the last file."""
+        frame = next(self.frames, b"")
+        if frame and self.realtime:
+            time.sleep(self.frame_ms / 1000)
+        return frame
+
+    def close(self):
+        self.frames = None
+
+    @staticmethod
+    def _rate(path):
+        with wave.open(path, "rb") as w:
+            return w.getframerate()
+
+    def _frames(self):
+        for path in self.paths:
+            with wave.open(path, "rb") as w:
+                if w.getsampwidth() != SAMPLE_WIDTH:
+                    raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+                if w.getframerate() != self.sample_rate:
+                    raise ValueError(f"{path}: sample rate {w.getframerate()} differs from {self.sample_rate}")
+                samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+                channels = w.getnchannels()
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+            step = self.sample_rate * self.frame_ms // 1000
+            silence = np.zeros(self.sample_rate * self.trailing_silence_ms // 1000, dtype=np.int16)
+            samples = np.concatenate([samples, silence])
+            for i in range(0, len(samples) - step + 1, step):
+                yield samples[i:i + step].tobytes()
+
+
+# ============================================================
+# 🗣️ Voice Activity Detection
+# ============================================================
+class EnergyVAD:
+    """RMS energy against a noise floor that tracks the room while nobody
+    is speaking."""
+
+    def __init__(self, ratio=3.0, min_rms=250.0, adapt=0.05):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.adapt = adapt
+        self.noise_floor = None
+
+    def is_speech(self, frame, sample_rate):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        speech = rms > max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            self.noise_floor += self.adapt * (rms - self.noise_floor)
+        return speech
+
+
+class WebRTCVAD:
+    def __init__(self, aggressiveness=2):
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame, sample_rate):
+        return self.vad.is_speech(frame, sample_rate)
+
+
+def make_vad(kind="auto", sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """"webrtc", "energy", or "auto" (webrtc when installed and usable)."""
+    usable = (webrtcvad is not None and sample_rate in (8000, 16000, 32000, 48000)
+              and frame_ms in (10, 20, 30))
+    if kind == "webrtc" and not usable:
+        raise ValueError("webrtcvad is not installed or does not support this rate/frame size")
+    if kind == "webrtc" or (kind == "auto" and usable):
+        return WebRTCVAD()
+    return EnergyVAD()
+
+
+# ============================================================
+# ✂️ Utterance Segmentation
+# ============================================================
+class Utterance(NamedTuple):
+    audio: sr.AudioData
+    start: float  # seconds since capture started
+    end: float
+    final: bool = True  # False: a snapshot of a phrase still being spoken
+
+
+class UtteranceSegmenter:
+    """Cuts a frame stream into utterances.
+
+    Speech starts when most frames in the pre-roll ring buffer are voiced;
+    the ring buffer is kept so the onset isn't clipped. It ends after
+    end_silence_ms of silence or at max_utterance_s.
+    """
+
+    def __init__(self, vad, sample_rate, frame_ms=FRAME_MS, preroll_ms=300, start_ratio=0.6,
+                 end_silence_ms=700, min_speech_ms=250, max_utterance_s=15.0):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.start_ratio = start_ratio
+        self.end_frames = max(end_silence_ms // frame_ms, 1)
+        self.min_frames = max(min_speech_ms // frame_ms, 1)
+        self.max_frames = int(max_utterance_s * 1000 // frame_ms)
+        self.ring = collections.deque(maxlen=max(preroll_ms // frame_ms, 1))  # (frame, voiced)
+        self.frame_count = 0
+        self.reset()
+
+    def reset(self):
+        """Forget any phrase in progress (e.g. while output is muted)."""
+        self.ring.clear()
+        self.frames = None  # frames of the current utterance, None between phrases
+        self.voiced = 0
+        self.silence = 0
+        self.start_frame = 0
+
+    def push(self, frame):
+        """Feed one frame; returns (start_frame, end_frame, pcm) when an
+        utterance finishes, else None."""
+        self.frame_count += 1
+        voiced = self.vad.is_speech(frame, self.sample_rate)
+
+        if self.frames is None:
+            self.ring.append((frame, voiced))
+            if sum(v for _, v in self.ring) >= self.start_ratio * self.ring.maxlen:
+                self.frames = [f for f, _ in self.ring]
+                self.voiced = sum(v for _, v in self.ring)
+                self.silence = 0
+                self.start_frame = self.frame_count - len(self.ring)
+                self.ring.clear()
+            return None
+
+        self.frames.append(frame)
+        self.voiced += voiced
+        self.silence = 0 if voiced else self.silence + 1
+        if self.silence >= self.end_frames or len(self.frames) >= self.max_frames:
+            return self._finish()
+        return None
+
+    def in_progress(self):
+        """(start_frame, end_frame, pcm) of the phrase being spoken, or None."""
+        if self.frames is None:
+            return None
+        return self.start_frame, self.start_frame + len(self.frames), b"".join(self.frames)
+
+    def flush(self):
+        """End of input: return the phrase in progress, if any."""
+        return self._finish() if self.frames is not None else None
+
+    def _finish(self):
+        frames, voiced, start = self.frames, self.voiced, self.start_frame
+        self.reset()
+        if voiced < self.min_frames:
+            return None  # a click or a cough, not speech
+        return start, start + len(frames), b"".join(frames)
+
+
+# ============================================================
+# 🎧 Listener
+# ============================================================
+class Listener:
+    """Captures from source on a background thread and queues utterances.
+
+    get() hands them out in order. While muted (e.g. while the assistant
+    is talking) frames are read and discarded, so its own voice isn't
+    transcribed. Finished phrases are never dropped, however far the
+    consumer falls behind.
+
+    With partial_ms > 0, a phrase still being spoken is also handed out
+    every partial_ms as a non-final Utterance holding everything heard so
+    far, for recognizers that produce partial transcripts. Only the latest
+    one is kept, outside the queue: a newer snapshot replaces it and the
+    phrase's final Utterance supersedes it.
+    """
+
+    def __init__(self, source, vad="auto", frame_ms=FRAME_MS, partial_ms=0, **segmenter_options):
+        self.source = source
+        self.vad = vad
+        self.frame_ms = frame_ms
+        self.partial_frames = partial_ms // frame_ms
+        self.segmenter_options = segmenter_options
+        self.queue = queue.Queue()  # final utterances
+        self.partial = None  # latest snapshot of the phrase in progress
+        self.arrived = threading.Event()
+        self.thread = None
+        self.running = False
+        self.finished = threading.Event()  # source exhausted or listener stopped
+        self.mute_depth = 0
+        self.lock = threading.Lock()
+        self.error = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.source.open()
+        self.running = True
+        self.finished.clear()
+        self.thread = threading.Thread(target=self._run, name="kuma-listener", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def get(self, timeout=None):
+        """Next Utterance; None on timeout or once the input has ended."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.arrived.clear()
+            try:
+                # finals first: a partial only ever belongs to the phrase after them
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                partial, self.partial = self.partial, None
+            if partial is not None:
+                return partial
+            if self.finished.is_set() and self.queue.empty():
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            self.arrived.wait(0.1)
+
+    @contextmanager
+    def muted(self):
+        with self.lock:
+            self.mute_depth += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.mute_depth -= 1
+
+    def _run(self):
+        rate = self.source.sample_rate
+        vad = make_vad(self.vad, rate, self.frame_ms) if isinstance(self.vad, str) else self.vad
+        segmenter = UtteranceSegmenter(vad, rate, frame_ms=self.frame_ms, **self.segmenter_options)
+        try:
+            while self.running:
+                frame = self.source.read()
+                if not frame:
+                    self._emit(segmenter.flush(), rate)
+                    break
+                if self.mute_depth:
+                    segmenter.reset()
+                    continue
+                self._emit(segmenter.push(frame), rate)
+                if self.partial_frames and segmenter.frames and len(segmenter.frames) % self.partial_frames == 0:
+                    self._emit(segmenter.in_progress(), rate, final=False)
+        except Exception as e:
+            self.error = e
+            print(f"⚠️ Audio capture stopped: {e}")
+        finally:
+            self.source.close()
+            self.running = False
+            self.finished.set()
+            self.arrived.set()
+
+    def pending(self):
+        """Utterances waiting in get(), the latest partial included."""
+        with self.lock:
+            return self.queue.qsize() + (self.partial is not None)
+
+    def _emit(self, segment, rate, final=True):
+        if segment is None:
+            return
+        start, end, pcm = segment
+        frame_s = self.frame_ms / 1000
+        utterance = Utterance(sr.AudioData(pcm, rate, self.source.sample_width),
+                              start * frame_s, end * frame_s, final)
+        with self.lock:
+            if final:
+                self.partial = None  # the final holds everything it did
+                self.queue.put(utterance)
+            else:
+                self.partial = utterance
+        self.arrived.set()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python audio_stream.py recording.wav [more.wav ...]")
+    listener = Listener(WavSource(sys.argv[1:]))
+    listener.start()
+    print(f"VAD: {type(make_vad(listener.vad, listener.source.sample_rate)).__name__}")
+    while (utterance := listener.get()) is not None:
+        if not utterance.final:
+            continue
+        seconds = len(utterance.audio.frame_data) / (utterance.audio.sample_rate * utterance.audio.sample_width)
+        print(f"🗣️ {utterance.start:7.2f}s – {utterance.end:7.2f}s  ({seconds:.2f}s of audio)")
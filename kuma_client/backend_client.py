@@ -0,0 +1,255 @@
+# backend_client.py
+"""
+One client for the Kuma backend, shared by voice_client, luffy_gui and
+capture_and_analyze (and the speculator).
+
+  - keep-alive: every call goes through one requests.Session, whose
+    connection pool reuses TCP connections instead of opening one per
+    request;
+  - retries: failures to connect and 502/503/504 answers are retried
+    with exponential backoff and jitter. A POST whose connection broke
+    after it was sent, or that timed out, is not retried: the backend
+    may have acted on it (remembered the turn, run an intent). Only GETs
+    are retried whatever the connection error;
+  - circuit breaker: after failure_threshold failures in a row the
+    circuit opens and calls fail at once with BackendUnavailable, so the
+    caller answers locally instead of waiting on timeouts. After
+    reset_after seconds one call is let through: success closes the
+    circuit, failure opens it again;
+  - latency: each call is logged with its status and time to response
+    headers, and stats() sums them up per route.
+
+    client = BackendClient(session_id="voice-123")
+    reply, timings = client.stream_reply("tell me a joke", on_sentence=print)
+"""
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+BASE_URL = os.getenv("KUMA_BACKEND_URL", "http://127.0.0.1:8000")
+# (connect, read) seconds; for streams, read is the longest silence between events
+DEFAULT_TIMEOUT = (3.05, 30)
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+LOG_REQUESTS = os.getenv("KUMA_HTTP_LOG", "1") == "1"
+
+
+class BackendError(Exception):
+    """The backend answered, but with an error (status or error event)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class BackendUnavailable(BackendError):
+    """The backend could not be reached, or the circuit is open."""
+
+
+def never_sent(error):
+    """Did this ConnectionError happen before the request reached the backend?"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    cause = error.args[0] if error.args else None
+    # urllib3 wraps the cause in MaxRetryError
+    return isinstance(getattr(cause, "reason", cause), NewConnectionError)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, reset_after=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False  # a half-open trial call is in flight
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """May a call go out now? In half-open state only one at a time does."""
+        with self.lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                print("🟢 Backend is back")
+            self.failures, self.opened_at, self.trial = 0, None, False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"🔴 Backend down after {self.failures} failures; answering locally "
+                          f"for {self.reset_after:g}s")
+                self.opened_at = time.monotonic()
+
+
+class BackendClient:
+    def __init__(self, base_url=BASE_URL, session_id=None, timeout=DEFAULT_TIMEOUT,
+                 retries=2, backoff=0.3, breaker=None, pool_size=8, log=LOG_REQUESTS):
+        self.base_url = base_url.rstrip("/")
+        self.session_id = session_id
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.log = log
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.latency = {}  # "METHOD /path" -> [calls, errors, total ms, max ms]
+
+    def available(self):
+        """False while the circuit is open (calls would fail at once)."""
+        return self.breaker.state != "open"
+
+    def request(self, method, path, json=None, stream=False, timeout=None, retries=None):
+        """The response (status < 500 or not retryable), through retries and the breaker.
+
+        Raises BackendUnavailable when the backend can't be reached.
+        """
+        route = f"{method} {path}"
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                raise BackendUnavailable("backend circuit is open")
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, json=json, stream=stream,
+                                                timeout=timeout or self.timeout)
+            except requests.exceptions.ConnectionError as e:
+                self._record(route, start, "unreachable", failed=True)
+                if method not in IDEMPOTENT_METHODS and not never_sent(e):
+                    # dropped after the request went out: replaying it could act twice
+                    raise BackendUnavailable(f"backend connection lost: {e}") from e
+                error = e
+            except requests.exceptions.Timeout as e:
+                self._record(route, start, "timeout", failed=True)
+                raise BackendUnavailable(f"backend timed out: {e}") from e
+            except requests.exceptions.RequestException as e:
+                # anything else (broken response, too many redirects...): not retried,
+                # but counted, which also ends a half-open trial
+                self._record(route, start, "error", failed=True)
+                raise BackendUnavailable(f"backend request failed: {e}") from e
+            else:
+                failed = response.status_code >= 500
+                self._record(route, start, response.status_code, failed=failed)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                response.close()
+                error = BackendError(f"Server error {response.status_code}", response.status_code)
+            if attempt < retries:
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        raise BackendUnavailable(f"backend unreachable: {error}") from error
+
+    def get_json(self, path, timeout=None):
+        response = self.request("GET", path, timeout=timeout)
+        if response.status_code != 200:
+            raise BackendError(f"Server error {response.status_code}", response.status_code)
+        return response.json()
+
+    def post_json(self, path, body=None, timeout=None, retries=None):
+        response = self.request("POST", path, json=body or {}, timeout=timeout, retries=retries)
+        if response.status_code != 200:
+            raise BackendError(f"Server error {response.status_code}", response.status_code)
+        return response.json()
+
+    def query(self, text, timeout=None, **fields):
+        """POST /query; returns the response (for its JSON and Server-Timing)."""
+        response = self.request("POST", "/query", json=self._body(text, fields), timeout=timeout)
+        if response.status_code != 200:
+            raise BackendError(f"Server error {response.status_code}", response.status_code)
+        return response
+
+    def stream(self, text, timeout=None, retries=None, **fields):
+        """POST /query/stream; yields each Server-Sent Event's payload."""
+        response = self.request("POST", "/query/stream", json=self._body(text, fields), stream=True,
+                                timeout=timeout, retries=retries)
+        with response:
+            if response.status_code != 200:
+                raise BackendError(f"Server error {response.status_code}", response.status_code)
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line and line.startswith("data:"):
+                        yield json.loads(line[len("data:"):].strip())
+            except requests.exceptions.RequestException as e:
+                self.breaker.failure()
+                raise BackendUnavailable(f"stream broken: {e}") from e
+
+    def stream_reply(self, text, on_sentence=None, **fields):
+        """The full reply from /query/stream, with each sentence handed to
+        on_sentence as soon as it arrives. Returns (reply, timings)."""
+        sentences = []
+        for event in self.stream(text, **fields):
+            kind = event.get("type")
+            if kind == "sentence":
+                sentence = event.get("text", "").strip()
+                if sentence:
+                    sentences.append(sentence)
+                    if on_sentence:
+                        on_sentence(sentence)
+            elif kind == "error":
+                raise BackendError(event.get("message", "backend error"))
+            elif kind == "done":
+                if event.get("partial"):
+                    print(f"⚠️ Reply cut off: {event.get('message', 'backend error')}")
+                return " ".join(sentences), event.get("timings") or {}
+        return " ".join(sentences), {}
+
+    def stats(self):
+        with self.lock:
+            routes = {
+                route: {"calls": calls, "errors": errors,
+                        "avg_ms": round(total / calls, 1), "max_ms": round(worst, 1)}
+                for route, (calls, errors, total, worst) in self.latency.items()
+            }
+        return {"circuit": self.breaker.state, "routes": routes}
+
+    def _body(self, text, fields):
+        body = {"text": text, **fields}
+        if self.session_id and "session_id" not in body:
+            body["session_id"] = self.session_id
+        return body
+
+    def _record(self, route, start, status, failed):
+        ms = (time.perf_counter() - start) * 1000
+        if failed:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        with self.lock:
+            entry = self.latency.setdefault(route, [0, 0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += failed
+            entry[2] += ms
+            entry[3] = max(entry[3], ms)
+        if self.log:
+            print(f"🌐 {route} {status} {ms:.0f}ms")
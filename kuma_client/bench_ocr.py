@@ -0,0 +1,132 @@
+# bench_ocr.py
+"""
+OCR benchmark over saved screenshots: the old path (save PNG, reopen it,
+image_to_string on the raw colour image) against ocr_pipeline
+(in memory, preprocessed, per-window PSM, persistent worker) and
+ocr_blocks (layout blocks across worker processes, block cache off so
+every pass does the full work).
+
+Put screenshots in a folder, each with the text it really shows next to
+it for accuracy (name.png + name.txt). The file name stands in for the
+window title when choosing the page segmentation mode, so name files
+after the app ("chrome_docs.png", "powershell_build.png"...).
+
+    python bench_ocr.py screenshots/
+    python bench_ocr.py screenshots/ -r 3 --dpi 144 --out ocr_bench.json
+    python bench_ocr.py screenshots/ --workers 4
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import tempfile
+import time
+
+import pytesseract
+from PIL import Image
+
+import ocr_blocks
+import ocr_pipeline
+
+
+def old_path(image, title):
+    """What capture_and_analyze did before: a PNG round-trip and a raw pass."""
+    path = os.path.join(tempfile.gettempdir(), "kuma_bench_active_window.png")
+    image.save(path)
+    return pytesseract.image_to_string(Image.open(path)).strip()
+
+
+def new_path(image, title, dpi=None):
+    return ocr_pipeline.ocr(image, title, dpi=dpi)
+
+
+def word_accuracy(truth, text):
+    """Share of matching words, 2*matches / (words in truth + words read)."""
+    a, b = truth.lower().split(), text.lower().split()
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def char_accuracy(truth, text):
+    a, b = " ".join(truth.split()), " ".join(text.split())
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kuma OCR benchmark")
+    parser.add_argument("folder", help="screenshots (*.png) with optional ground truth (*.txt)")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="passes over the folder per method")
+    parser.add_argument("--dpi", type=int, default=None, help="display DPI the screenshots were taken at")
+    parser.add_argument("--workers", type=int, default=None, help="OCR processes for the block method")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    images = sorted(glob.glob(os.path.join(args.folder, "*.png")))
+    if not images:
+        raise SystemExit(f"no *.png in {args.folder}")
+    print(f"{len(images)} screenshots; Tesseract worker: "
+          f"{'persistent (tesserocr)' if ocr_pipeline.get_worker().persistent else 'pytesseract (process per call)'}")
+
+    blocks = ocr_blocks.BlockOCR(workers=args.workers, cache_size=0, min_pixels=0).start()
+    print(f"Block OCR: {blocks.workers} worker process(es)")
+    methods = {"old": old_path, "pipeline": lambda img, title: new_path(img, title, args.dpi),
+               "blocks": lambda img, title: blocks.ocr(img, title, args.dpi)}
+    results = {}
+    for name, fn in methods.items():
+        per_image = []
+        for path in images:
+            image = Image.open(path)
+            image.load()
+            title = os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+            truth_path = os.path.splitext(path)[0] + ".txt"
+            truth = open(truth_path, encoding="utf-8").read() if os.path.exists(truth_path) else None
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                text = fn(image, title)
+                times.append(time.perf_counter() - start)
+            per_image.append({
+                "image": os.path.basename(path),
+                "ms": round(min(times) * 1000, 1),
+                "words": word_accuracy(truth, text) if truth is not None else None,
+                "chars": char_accuracy(truth, text) if truth is not None else None,
+            })
+        scored = [r for r in per_image if r["words"] is not None]
+        results[name] = {
+            "total_ms": round(sum(r["ms"] for r in per_image), 1),
+            "word_accuracy": round(sum(r["words"] for r in scored) / len(scored), 4) if scored else None,
+            "char_accuracy": round(sum(r["chars"] for r in scored) / len(scored), 4) if scored else None,
+            "images": per_image,
+        }
+
+    print(f"\n{'image':<32} " + " ".join(f"{m + ' ms':>12} {m + ' acc':>12}" for m in methods))
+    for i, path in enumerate(images):
+        row = f"{os.path.basename(path)[:32]:<32} "
+        for m in methods:
+            r = results[m]["images"][i]
+            acc = f"{r['words']:.1%}" if r["words"] is not None else "-"
+            row += f"{r['ms']:>12.0f} {acc:>12} "
+        print(row)
+    print()
+    for m in methods:
+        r = results[m]
+        acc = (f"words {r['word_accuracy']:.1%}, chars {r['char_accuracy']:.1%}"
+               if r["word_accuracy"] is not None else "no ground truth")
+        print(f"{m:<9} total {r['total_ms']:>9.0f} ms   {acc}")
+    if results["old"]["total_ms"]:
+        for m in ("pipeline", "blocks"):
+            print(f"speed-up ({m}): {results['old']['total_ms'] / max(results[m]['total_ms'], 1e-9):.2f}x")
+    blocks.close()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
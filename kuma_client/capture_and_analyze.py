@@ -1,32 +1,49 @@
 # capture_and_analyze.py
+import argparse
 import pygetwindow as gw
 import pyautogui
-import pytesseract
-from PIL import Image
-import requests
 import time
 import os
 import sys
 import pyttsx3
+import uuid
 
-# adjust if your tesseract path is different:
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+import backend_client
+import ocr_blocks
+import ocr_pipeline  # tesseract path: TESSERACT_CMD environment variable
+import ocr_reduce
+import screen_watch
 
-BACKEND_QUERY = "http://127.0.0.1:8000/query"
+# set KUMA_SAVE_CAPTURE=1 to also write each capture here (debugging only)
 TEMP_IMAGE = "active_window.png"
+SAVE_CAPTURE = os.getenv("KUMA_SAVE_CAPTURE", "0") == "1"
+SESSION_ID = f"screen-{uuid.uuid4().hex[:12]}"
+# Backend address: KUMA_BACKEND_URL (see backend_client.py)
+backend = backend_client.BackendClient(session_id=SESSION_ID)
+# what of the OCR text reaches the backend (see ocr_reduce)
+MIN_WORD_CONF = int(os.getenv("KUMA_OCR_MIN_CONF", ocr_reduce.MIN_WORD_CONF))
+TOKEN_BUDGET = int(os.getenv("KUMA_OCR_TOKEN_BUDGET", ocr_reduce.TOKEN_BUDGET))
 
-# simple TTS for replies (offline)
-engine = pyttsx3.init()
-engine.setProperty("rate", 165)
-voices = engine.getProperty("voices")
-if voices:
-    engine.setProperty("voice", voices[0].id)
+# simple TTS for replies (offline); created on first use so the OCR worker
+# processes, which import this module again on Windows, don't start one
+engine = None
 
-def capture_active_window(save_path=TEMP_IMAGE, delay=1.2):
-    """Capture the currently active window and save to file."""
+def get_engine():
+    global engine
+    if engine is None:
+        engine = pyttsx3.init()
+        engine.setProperty("rate", 165)
+        voices = engine.getProperty("voices")
+        if voices:
+            engine.setProperty("voice", voices[0].id)
+    return engine
+
+def capture_active_window(save_path=None, verbose=True):
+    """Capture the currently active window; returns (PIL image, title)."""
     win = gw.getActiveWindow()
     if not win:
-        print("❌ No active window found.")
+        if verbose:
+            print("❌ No active window found.")
         return None, "No active window"
     # If window coordinates invalid (some apps), fallback to full screen
     try:
@@ -37,45 +54,64 @@ def capture_active_window(save_path=TEMP_IMAGE, delay=1.2):
     except Exception as e:
         print(f"⚠️ Window capture failed: {e}. Falling back to full screen.")
         img = pyautogui.screenshot()
-    img.save(save_path)
-    print(f"✅ Screenshot saved: {save_path}  (window: {win.title})")
-    return save_path, win.title
-
-def ocr_image(image_path):
-    """Return extracted text from image using Tesseract."""
-    if not os.path.exists(image_path):
-        return ""
-    img = Image.open(image_path)
-    text = pytesseract.image_to_string(img)
-    return text.strip()
-
-def send_to_backend(text):
-    """POST OCR text to backend /query and return reply (string)."""
+    if save_path:
+        img.save(save_path)
+    if verbose:
+        print(f"✅ Captured {img.width}x{img.height}  (window: {win.title})")
+    return img, win.title
+
+def ocr_image(image, title=""):
+    """Return extracted text from a captured image (in memory, preprocessed;
+    large captures are read block by block across worker processes)."""
+    start = time.perf_counter()
+    block_ocr = ocr_blocks.get_block_ocr()
+    text = block_ocr.ocr(image, title, min_conf=MIN_WORD_CONF)
+    print(f"⏱️ OCR: {(time.perf_counter() - start) * 1000:.0f}ms {block_ocr.last}")
+    return text
+
+def reduce_text(text):
+    """OCR text cut down to what is worth sending (see ocr_reduce)."""
+    reduced = ocr_reduce.reduce(text, TOKEN_BUDGET)
+    print(f"✂️ OCR text: {reduced.lines_in} -> {reduced.lines_out} lines, "
+          f"~{reduced.tokens_in} -> ~{reduced.tokens_out} tokens")
+    return reduced.text
+
+def send_to_backend(text, label="Screen read"):
+    """POST OCR text to backend /query and return reply (string).
+
+    Screen text was never said by anyone: intents=False keeps the backend
+    from acting on words that happen to be on screen ("Clear tasks",
+    "Remember me") and from storing them in memory or the reply cache.
+    """
     try:
-        payload = {"text": f"Screen read:\n{text}"}
-        r = requests.post(BACKEND_QUERY, json=payload, timeout=20)
-        if r.status_code == 200:
-            return r.json().get("reply", "")
-        else:
-            return f"Server error {r.status_code}"
+        r = backend.query(f"{label}:\n{text}", speak=False, intents=False)
+        if r.headers.get("Server-Timing"):
+            print("⏱️ Backend:", r.headers["Server-Timing"])
+        return r.json().get("reply", "")
+    except backend_client.BackendUnavailable:
+        return "Backend not reachable, Captain."
+    except backend_client.BackendError as e:
+        return f"Server error {e.status}"
     except Exception as e:
         return f"Connection error: {e}"
 
 def speak_text(text):
     print("\n🔊 Onepiece says:", text)
     try:
-        engine.say(text)
-        engine.runAndWait()
+        tts = get_engine()
+        tts.say(text)
+        tts.runAndWait()
     except Exception as e:
         print("TTS error:", e)
 
 def capture_ocr_and_talk():
-    img_path, title = capture_active_window()
-    if not img_path:
+    ocr_blocks.get_block_ocr().start()  # spawn OCR workers while the capture happens
+    img, title = capture_active_window(TEMP_IMAGE if SAVE_CAPTURE else None)
+    if img is None:
         speak_text("I couldn't capture the window, Captain.")
         return
 
-    ocr_text = ocr_image(img_path)
+    ocr_text = ocr_image(img, title)
     if not ocr_text or len(ocr_text.strip()) == 0:
         speak_text("I couldn't find readable text on the screen, Captain.")
         print("OCR returned empty.")
@@ -85,11 +121,49 @@ def capture_ocr_and_talk():
     print("\n🧾 OCR snippet:\n", ocr_text[:700].replace("\n", " ") + ("..." if len(ocr_text) > 700 else ""))
 
     # Send to backend for AI understanding
-    reply = send_to_backend(ocr_text)
+    screen_text = reduce_text(ocr_text)
+    if not screen_text:
+        speak_text("There's nothing but menus and noise on that screen, Captain.")
+        return
+    reply = send_to_backend(screen_text)
     speak_text(reply)
 
+def watch_screen(interval=2.0, speak=False):
+    """Capture the active window every interval seconds; only text that is
+    new on screen is OCRed and sent to the backend."""
+    watcher = screen_watch.ScreenWatcher(
+        ocr=lambda image, title: ocr_blocks.ocr(image, title, min_conf=MIN_WORD_CONF))
+    print(f"👀 Watching the active window every {interval:g}s (Ctrl+C to stop)")
+    try:
+        while True:
+            started = time.perf_counter()
+            img, title = capture_active_window(verbose=False)
+            if img is not None:
+                new_lines = watcher.update(img, title)
+                screen_text = reduce_text("\n".join(new_lines)) if new_lines else ""
+                if screen_text:
+                    print(f"\n🧾 {len(new_lines)} new line(s) in {title!r} "
+                          f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+                    reply = send_to_backend(screen_text, label=f"Screen update ({title})")
+                    if speak:
+                        speak_text(reply)
+                    else:
+                        print("\n💬", reply)
+            time.sleep(max(interval - (time.perf_counter() - started), 0))
+    except KeyboardInterrupt:
+        print(f"\n📊 {watcher.stats()}")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the active window and ask Kuma about it")
+    parser.add_argument("--watch", action="store_true", help="keep watching and report new text")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between captures in watch mode")
+    parser.add_argument("--speak", action="store_true", help="speak watch-mode replies")
+    args = parser.parse_args()
+
     # small delay to let you switch to the target window if you want
     print("Capture will start in 2 seconds. Switch to the window you want Onepiece to read.")
     time.sleep(2)
-    capture_ocr_and_talk()
+    if args.watch:
+        watch_screen(args.interval, speak=args.speak)
+    else:
+        capture_ocr_and_talk()
@@ -0,0 +1,82 @@
+# eval_wake_word.py
+"""
+False-accept / false-reject rates of the wake-word spotter on recorded
+WAV fixtures.
+
+Layout (defaults, relative to this file):
+    wake_templates/          the wake word, as used at runtime
+    wake_fixtures/positive/  phrases that contain the wake word
+    wake_fixtures/negative/  phrases that don't (other commands, chatter, TV...)
+
+Fixtures must be different recordings from the templates, or the
+false-reject rate will look better than it really is.
+
+    python eval_wake_word.py
+    python eval_wake_word.py --sensitivity 0.3 0.5 0.7 --verbose
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import wake_word
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_dir(path):
+    paths = sorted(glob.glob(os.path.join(path, "*.wav")))
+    return [(os.path.basename(p), wake_word.read_wav(p)) for p in paths]
+
+
+def score_all(spotter, fixtures):
+    scores, elapsed = [], 0.0
+    for name, (samples, rate) in fixtures:
+        start = time.perf_counter()
+        scores.append((name, spotter.score_samples(samples, rate)))
+        elapsed += time.perf_counter() - start
+    return scores, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the offline wake-word spotter")
+    parser.add_argument("--templates", default=wake_word.TEMPLATES_DIR)
+    parser.add_argument("--positives", default=os.path.join(HERE, "wake_fixtures", "positive"))
+    parser.add_argument("--negatives", default=os.path.join(HERE, "wake_fixtures", "negative"))
+    parser.add_argument("--sensitivity", type=float, nargs="+", default=[0.25, 0.5, 0.75])
+    parser.add_argument("--verbose", action="store_true", help="print the score of every file")
+    args = parser.parse_args()
+
+    spotter = wake_word.WakeWordSpotter.from_dir(args.templates)
+    if spotter is None:
+        sys.exit(f"No templates in {args.templates}; run: python wake_word.py enroll")
+    positives, negatives = load_dir(args.positives), load_dir(args.negatives)
+    if not positives or not negatives:
+        sys.exit(f"Need WAVs in both {args.positives} and {args.negatives}")
+
+    pos_scores, pos_time = score_all(spotter, positives)
+    neg_scores, neg_time = score_all(spotter, negatives)
+    audio_s = sum(len(s) / r for _, (s, r) in positives + negatives)
+    print(f"{len(spotter.templates)} templates, calibrated distance {spotter.calibrated:.3f}")
+    print(f"{len(positives)} positive / {len(negatives)} negative files, {audio_s:.1f}s of audio, "
+          f"scored in {(pos_time + neg_time) * 1000:.0f} ms "
+          f"({(pos_time + neg_time) / len(positives + negatives) * 1000:.1f} ms per phrase)")
+
+    if args.verbose:
+        for label, scores in (("+", pos_scores), ("-", neg_scores)):
+            for name, score in scores:
+                print(f"  {label} {score:7.3f}  {name}")
+
+    print(f"\n{'sensitivity':>11} {'threshold':>9} {'FAR':>7} {'FRR':>7}")
+    for sensitivity in args.sensitivity:
+        spotter.sensitivity = sensitivity
+        threshold = spotter.threshold
+        false_accepts = sum(score <= threshold for _, score in neg_scores)
+        false_rejects = sum(score > threshold for _, score in pos_scores)
+        print(f"{sensitivity:>11.2f} {threshold:>9.3f} "
+              f"{false_accepts / len(negatives):>7.1%} {false_rejects / len(positives):>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
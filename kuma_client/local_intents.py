@@ -0,0 +1,80 @@
+# local_intents.py
+"""
+Client-side fast path for purely local intents (time, date, jokes, opening
+sites and apps). Uses the backend's intent table and matcher, so client and
+backend always agree on which intent an utterance is; only intents marked
+"client": true are answered here, everything else goes to the backend.
+"""
+import importlib.util
+import os
+import webbrowser
+from datetime import datetime
+
+KUMA_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTENTS_DIR = os.path.join(KUMA_ROOT, "kuma_backend", "app")
+INTENTS_FILE = os.getenv("KUMA_INTENTS_FILE", os.path.join(INTENTS_DIR, "intents.json"))
+
+
+def load_backend_module(name):
+    """Import a self-contained module from kuma_backend/app by file path."""
+    spec = importlib.util.spec_from_file_location(f"kuma_{name}", os.path.join(INTENTS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+matcher = load_backend_module("intents").IntentMatcher.from_file(INTENTS_FILE)
+
+
+# ============================================================
+# ⚙️ Client Actions
+# ============================================================
+def action_clock(intent, text, match):
+    return datetime.now().strftime(intent.get("format"))
+
+
+def action_open_url(intent, text, match):
+    webbrowser.open(intent.get("url"))
+    return intent.get("reply")
+
+
+def action_run(intent, text, match):
+    os.system(intent.get("command"))
+    return intent.get("reply")
+
+
+def action_open_folder(intent, text, match):
+    os.startfile(os.path.join(os.path.expanduser("~"), intent.get("folder")))
+    return intent.get("reply")
+
+
+ACTIONS = {
+    "clock": action_clock,
+    "reply": lambda intent, text, match: intent.get("reply"),
+    "open_url": action_open_url,
+    "run": action_run,
+    "open_folder": action_open_folder,
+}
+
+
+def register_action(name, fn):
+    """Let a client supply an action (e.g. weather) for offline fallback."""
+    ACTIONS[name] = fn
+
+
+def handle(text, offline=False):
+    """Answer text in-process, or return None to forward it to the backend.
+
+    Normally only intents marked "client": true are answered. With
+    offline=True (backend unreachable) any intent with a client action is.
+    """
+    match = matcher.match(text)
+    if not match:
+        return None
+    if not (offline or match.intent.get("client")):
+        return None
+    action = ACTIONS.get(match.intent.action)
+    if not action:
+        return None
+    print(f"⚡ Local intent: {match.intent.name} ({match.reason()})")
+    return action(match.intent, text, match)
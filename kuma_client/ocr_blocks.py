@@ -0,0 +1,209 @@
+# ocr_blocks.py
+"""
+Block-level OCR for big captures (the full-screen fallback, 4K windows).
+
+    PIL image -> ocr_pipeline.preprocess -> XY-cut into text blocks
+              -> cache lookup -> process pool (one Tesseract per process)
+              -> text in reading order
+
+The binarized page is cut recursively at its widest blank row or column
+band (XY-cut), so blocks come out in reading order: top to bottom, and
+left to right within a row of columns. Each block is cropped to its ink
+and OCRed as one uniform block of text by a pool of worker processes, so
+wall time drops with the number of cores. Results are cached by a hash of
+the block's pixels: menus, sidebars and toolbars that didn't change
+between captures are never read twice.
+
+Small images skip all of this and take ocr_pipeline.ocr's single pass,
+where the pool would cost more than it saves.
+"""
+import atexit
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import ocr_pipeline
+
+MIN_PIXELS = 1280 * 720     # below this (before scaling) one pass is faster
+BLOCK_PSM = 6               # each block is one uniform block of text
+PAD = 8                     # white border around each crop, Tesseract likes margins
+MIN_INK = 20                # blocks with fewer dark pixels are specks
+
+
+def default_workers():
+    """KUMA_OCR_WORKERS, else one per core leaving one for the app."""
+    if os.getenv("KUMA_OCR_WORKERS"):
+        return max(1, int(os.getenv("KUMA_OCR_WORKERS")))
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+# ============================================================
+# 📐 Layout: recursive XY-cut
+# ============================================================
+def _gaps(profile, min_gap):
+    """(start, end) of the blank runs of at least min_gap inside profile,
+    ignoring the margins before the first and after the last ink."""
+    ink = np.flatnonzero(profile)
+    if len(ink) < 2:
+        return []
+    steps = np.diff(ink)
+    wide = np.flatnonzero(steps > min_gap)
+    return [(ink[i] + 1, ink[i + 1]) for i in wide]
+
+
+def find_blocks(ink, min_row_gap=24, min_col_gap=40, max_depth=12):
+    """Boxes (left, top, right, bottom) of the text blocks of a boolean ink
+    mask, in reading order and trimmed to their ink."""
+    blocks = []
+
+    def cut(top, left, bottom, right, depth):
+        region = ink[top:bottom, left:right]
+        rows, cols = region.sum(axis=1), region.sum(axis=0)
+        if rows.sum() < MIN_INK:
+            return
+        # trim to the ink
+        r = np.flatnonzero(rows)
+        c = np.flatnonzero(cols)
+        top, bottom = top + r[0], top + r[-1] + 1
+        left, right = left + c[0], left + c[-1] + 1
+        rows, cols = rows[r[0]:r[-1] + 1], cols[c[0]:c[-1] + 1]
+
+        if depth < max_depth:
+            row_gaps = _gaps(rows, min_row_gap)
+            col_gaps = _gaps(cols, min_col_gap)
+            # cut along the direction whose widest gap stands out more
+            row_score = max((e - s for s, e in row_gaps), default=0) / min_row_gap
+            col_score = max((e - s for s, e in col_gaps), default=0) / min_col_gap
+            if row_score or col_score:
+                if row_score >= col_score:
+                    edges = [0] + [g for gap in row_gaps for g in gap] + [len(rows)]
+                    for s, e in zip(edges[::2], edges[1::2]):
+                        cut(top + s, left, top + e, right, depth + 1)
+                else:
+                    edges = [0] + [g for gap in col_gaps for g in gap] + [len(cols)]
+                    for s, e in zip(edges[::2], edges[1::2]):
+                        cut(top, left + s, bottom, left + e, depth + 1)
+                return
+        blocks.append((int(left), int(top), int(right), int(bottom)))
+
+    cut(0, 0, ink.shape[0], ink.shape[1], 0)
+    return blocks
+
+
+# ============================================================
+# 🏭 Worker processes
+# ============================================================
+def _init_worker():
+    # N processes already use N cores; Tesseract's own threads would fight them
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_block(data, size, psm, min_conf=None):
+    """Runs in a pool process: raw 'L' pixels -> text."""
+    image = Image.frombytes("L", size, data)
+    worker = ocr_pipeline.get_worker()
+    if min_conf:
+        return ocr_pipeline.confident_text(worker.image_to_data(image, psm=psm), min_conf)
+    return worker.image_to_string(image, psm=psm).strip()
+
+
+class BlockOCR:
+    """OCR by blocks, fanned out to worker processes, with a block cache."""
+
+    def __init__(self, workers=None, cache_size=2000, min_pixels=MIN_PIXELS):
+        self.workers = workers or default_workers()
+        self.cache_size = cache_size
+        self.min_pixels = min_pixels
+        self.cache = OrderedDict()  # (shape, min_conf, pixel hash) -> text, oldest first
+        self.lock = threading.Lock()
+        self.pool = None
+        self.hits = 0
+        self.misses = 0
+        self.last = {}
+
+    def start(self):
+        """Start the worker processes now (they are otherwise started on first use)."""
+        with self.lock:
+            if self.pool is None and self.workers > 1:
+                self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        return self
+
+    def close(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    def ocr(self, image, title="", dpi=None, min_conf=None):
+        """Text of a screenshot, like ocr_pipeline.ocr."""
+        if image.width * image.height < self.min_pixels:
+            self.last = {"blocks": 1, "cached": 0}
+            return ocr_pipeline.ocr(image, title, dpi=dpi, min_conf=min_conf)
+
+        started = time.perf_counter()
+        scale = min(max(ocr_pipeline.TARGET_DPI / (dpi or ocr_pipeline.screen_dpi()), 1.0),
+                    ocr_pipeline.MAX_SCALE)
+        page = ocr_pipeline.preprocess(image, dpi)
+        pixels = np.asarray(page)
+        # gaps measured in screen pixels (at 100% scaling), then scaled like the page
+        boxes = find_blocks(pixels == 0, min_row_gap=int(12 * scale), min_col_gap=int(20 * scale))
+        layout_ms = (time.perf_counter() - started) * 1000
+
+        texts = [None] * len(boxes)
+        todo = []  # (index, key, data, size)
+        for i, (left, top, right, bottom) in enumerate(boxes):
+            crop = np.full((bottom - top + 2 * PAD, right - left + 2 * PAD), 255, dtype=np.uint8)
+            crop[PAD:-PAD, PAD:-PAD] = pixels[top:bottom, left:right]
+            data = crop.tobytes()
+            key = (crop.shape, min_conf, hashlib.blake2b(data, digest_size=16).digest())
+            with self.lock:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    texts[i] = self.cache[key]
+                    continue
+            todo.append((i, key, data, (crop.shape[1], crop.shape[0])))
+
+        if todo:
+            if self.workers > 1 and len(todo) > 1:
+                pool = self.start().pool
+                futures = [pool.submit(_ocr_block, data, size, BLOCK_PSM, min_conf) for _, _, data, size in todo]
+                results = [f.result() for f in futures]
+            else:
+                results = [_ocr_block(data, size, BLOCK_PSM, min_conf) for _, _, data, size in todo]
+            with self.lock:
+                for (i, key, _, _), text in zip(todo, results):
+                    texts[i] = text
+                    self.cache[key] = text
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        self.hits += len(boxes) - len(todo)
+        self.misses += len(todo)
+        self.last = {"blocks": len(boxes), "cached": len(boxes) - len(todo),
+                     "layout_ms": round(layout_ms, 1),
+                     "total_ms": round((time.perf_counter() - started) * 1000, 1)}
+        return "\n".join(t for t in texts if t)
+
+
+_block_ocr = None
+_block_ocr_lock = threading.Lock()
+
+
+def get_block_ocr():
+    global _block_ocr
+    with _block_ocr_lock:
+        if _block_ocr is None:
+            _block_ocr = BlockOCR()
+            atexit.register(_block_ocr.close)
+        return _block_ocr
+
+
+def ocr(image, title="", dpi=None, min_conf=None):
+    """Drop-in for ocr_pipeline.ocr that reads big images block by block."""
+    return get_block_ocr().ocr(image, title, dpi, min_conf)
@@ -0,0 +1,189 @@
+# ocr_pipeline.py
+"""
+In-memory OCR for screenshots.
+
+    PIL image -> preprocess (NumPy) -> persistent Tesseract worker -> text
+
+Nothing touches the disk. Preprocessing converts to grayscale, flips dark
+themes to dark-on-light, scales the image so screen text reaches the
+size Tesseract reads best at, and binarizes with a local (adaptive)
+threshold so coloured panels and gradients don't swallow the text. It
+runs as whole-array operations (PIL's C filters and NumPy), with no
+Python loops over pixels. The page segmentation mode is picked from the
+window type: terminals and editors are one uniform block, chat apps one
+column of lines, browsers and documents get full layout analysis.
+
+With min_conf, words Tesseract is less sure of than that (0-100) are
+left out of the text; UI chrome and noise typically read as such.
+
+The worker keeps one Tesseract engine loaded for the whole run via the
+tesserocr bindings (optional dependency). Without tesserocr it falls
+back to pytesseract, which starts a tesseract process per call.
+"""
+import ctypes
+import os
+import sys
+import threading
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageFilter, ImageOps
+
+try:
+    import tesserocr
+except ImportError:  # optional: pytesseract (one process per call) is used instead
+    tesserocr = None
+
+pytesseract.pytesseract.tesseract_cmd = os.getenv(
+    "TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+# Screen text is rendered at 96 dpi per 100% of display scaling. Tesseract
+# reads it far better at about twice that; more only costs OCR time.
+TARGET_DPI = 192
+MAX_SCALE = 3.0
+
+# (title keywords, page segmentation mode); first match wins
+PSM_RULES = [
+    (("powershell", "command prompt", "cmd.exe", "terminal", "bash", "wsl", "visual studio code",
+      "pycharm", "notepad", "sublime", "vim"), 6),                         # one uniform block of text
+    (("discord", "slack", "teams", "whatsapp", "telegram", "messenger"), 4),  # one column, mixed sizes
+    (("chrome", "edge", "firefox", "opera", "brave", "word", "acrobat", ".pdf", "outlook"), 3),  # full layout
+]
+DEFAULT_PSM = 3
+SPARSE_PSM = 11          # scattered labels: small dialogs, toolbars
+SMALL_WINDOW = 400 * 300  # pixels; below this a window is treated as a dialog
+
+
+def screen_dpi():
+    """Logical DPI of the main display (96 at 100% scaling); KUMA_SCREEN_DPI overrides."""
+    if os.getenv("KUMA_SCREEN_DPI"):
+        return int(os.getenv("KUMA_SCREEN_DPI"))
+    if sys.platform == "win32":
+        try:
+            return ctypes.windll.user32.GetDpiForSystem()
+        except Exception:
+            pass
+    return 96
+
+
+def choose_psm(title="", size=None):
+    lowered = (title or "").lower()
+    for keywords, psm in PSM_RULES:
+        if any(k in lowered for k in keywords):
+            return psm
+    if size and size[0] * size[1] < SMALL_WINDOW:
+        return SPARSE_PSM
+    return DEFAULT_PSM
+
+
+# ============================================================
+# 🧼 Preprocessing
+# ============================================================
+def to_gray(image):
+    """8-bit luminance of a PIL image, dark themes inverted to dark-on-light."""
+    gray = image.convert("L")
+    if np.asarray(gray).mean() < 128:
+        gray = ImageOps.invert(gray)
+    return gray
+
+
+def adaptive_threshold(gray, window=31, offset=10):
+    """Black where a pixel is darker than the mean of its window x window
+    neighbourhood minus offset, white elsewhere (gray: PIL 'L' image)."""
+    means = np.asarray(gray.filter(ImageFilter.BoxBlur(window // 2)), dtype=np.int16)
+    pixels = np.asarray(gray, dtype=np.int16)
+    return Image.fromarray(np.where(pixels < means - offset, 0, 255).astype(np.uint8))
+
+
+def preprocess(image, dpi=None):
+    """Grayscale, rescale to TARGET_DPI and binarize; returns a PIL 'L' image."""
+    scale = min(max(TARGET_DPI / (dpi or screen_dpi()), 1.0), MAX_SCALE)
+    gray = to_gray(image)
+    if scale > 1.0:
+        gray = gray.resize((round(gray.width * scale), round(gray.height * scale)), Image.BICUBIC)
+    # the window spans a couple of text lines at the scaled size
+    return adaptive_threshold(gray, window=int(15 * scale) | 1)
+
+
+# ============================================================
+# 🔤 Tesseract
+# ============================================================
+class TesseractWorker:
+    """One Tesseract engine shared by every call (calls are serialized)."""
+
+    def __init__(self, lang="eng", tessdata=None):
+        self.lang = lang
+        self.lock = threading.Lock()
+        self.api = None
+        if tesserocr is not None:
+            kwargs = {"lang": lang}
+            if tessdata:
+                kwargs["path"] = tessdata
+            self.api = tesserocr.PyTessBaseAPI(**kwargs)
+
+    @property
+    def persistent(self):
+        return self.api is not None
+
+    def image_to_string(self, image, psm=DEFAULT_PSM):
+        with self.lock:
+            if self.api is None:
+                return pytesseract.image_to_string(image, lang=self.lang, config=f"--psm {psm} --dpi {TARGET_DPI}")
+            self.api.SetPageSegMode(psm)
+            self.api.SetImage(image)
+            self.api.SetSourceResolution(TARGET_DPI)
+            return self.api.GetUTF8Text()
+
+    def image_to_data(self, image, psm=DEFAULT_PSM):
+        """Tesseract's TSV output: one row per block/paragraph/line/word."""
+        with self.lock:
+            if self.api is None:
+                return pytesseract.image_to_data(image, lang=self.lang, config=f"--psm {psm} --dpi {TARGET_DPI}")
+            self.api.SetPageSegMode(psm)
+            self.api.SetImage(image)
+            self.api.SetSourceResolution(TARGET_DPI)
+            return self.api.GetTSVText(0)
+
+    def close(self):
+        if self.api is not None:
+            self.api.End()
+            self.api = None
+
+
+def confident_text(tsv, min_conf):
+    """Text from image_to_data TSV keeping only words with conf >= min_conf;
+    lines left without a word are dropped."""
+    lines = {}  # (block, paragraph, line) -> words, in reading order
+    for row in tsv.splitlines():
+        fields = row.split("\t")
+        if len(fields) < 12 or fields[0] != "5":  # level 5 = word; also skips the header
+            continue
+        try:
+            conf = float(fields[10])
+        except ValueError:
+            continue
+        word = fields[11].strip()
+        if word and conf >= min_conf:
+            lines.setdefault((fields[2], fields[3], fields[4]), []).append(word)
+    return "\n".join(" ".join(words) for words in lines.values())
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TesseractWorker()
+        return _worker
+
+
+def ocr(image, title="", dpi=None, worker=None, min_conf=None):
+    """Text of a screenshot (PIL image) of the window called title."""
+    psm = choose_psm(title, image.size)
+    worker = worker or get_worker()
+    if min_conf:
+        return confident_text(worker.image_to_data(preprocess(image, dpi), psm=psm), min_conf)
+    return worker.image_to_string(preprocess(image, dpi), psm=psm).strip()
@@ -0,0 +1,128 @@
+# ocr_reduce.py
+"""
+Shrinks OCR text before it is sent to the backend.
+
+Raw screen OCR is mostly noise for the model: misread icons, menu bars,
+cookie banners, the same button label five times. Everything sent ends up
+in the prompt, the conversation history and memory, so it is cut down
+here:
+
+  1. garbage lines (mostly symbols, no real word) are dropped;
+  2. repeated lines are kept once (case, spacing and punctuation ignored);
+  3. boilerplate goes: lines made only of UI words ("File Edit View",
+     "Reply Share") and legal/cookie/sign-in banners;
+  4. if what is left is over the token budget, the most informative
+     lines are kept, in screen order. Information is counted as
+     distinct content words, each weighted down by how many lines it
+     appears in, plus numbers, per token spent. If the best line alone
+     is over budget, it is cut down to fit.
+
+Low-confidence words are removed earlier, by OCR with min_conf (see
+ocr_pipeline.confident_text).
+"""
+import re
+from typing import NamedTuple
+
+MIN_WORD_CONF = 60      # Tesseract word confidence (0-100) kept by capture_and_analyze
+TOKEN_BUDGET = 350      # roughly what the model gets to see of one screen
+CHARS_PER_TOKEN = 4     # estimate for English text with an OpenAI tokenizer
+
+WORD_RE = re.compile(r"[^\W\d_]{2,}")
+NUMBER_RE = re.compile(r"\d+(?:[.,:/]\d+)*")
+KEY_RE = re.compile(r"[\W_]+")
+
+UI_WORDS = {
+    "file", "edit", "view", "insert", "format", "tools", "help", "window", "selection", "go", "run",
+    "terminal", "home", "search", "menu", "settings", "options", "back", "forward", "next",
+    "previous", "close", "cancel", "ok", "apply", "save", "open", "new", "share", "reply",
+    "like", "follow", "subscribe", "more", "less", "show", "hide", "copy", "paste", "cut",
+    "undo", "redo", "refresh", "reload", "login", "log", "sign", "in", "out", "up", "account",
+    "profile", "notifications", "messages", "inbox", "bookmarks", "history", "downloads",
+    "extensions", "tab", "tabs", "sidebar", "minimize", "maximize", "restore", "all", "yes", "no",
+}
+BOILERPLATE_RE = re.compile(
+    r"cookie|all rights reserved|privacy policy|terms of (use|service)|©|copyright|"
+    r"sign in to|log in to|accept all|skip to (main )?content",
+    re.IGNORECASE)
+
+
+class Reduced(NamedTuple):
+    text: str
+    lines_in: int
+    lines_out: int
+    tokens_in: int
+    tokens_out: int
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def is_garbage(line):
+    """Mostly symbols, or not a single real word or number in it."""
+    letters = sum(ch.isalnum() for ch in line)
+    if letters < 0.5 * len(line.replace(" ", "")):
+        return True
+    return not WORD_RE.search(line) and not NUMBER_RE.search(line)
+
+
+def is_boilerplate(line):
+    words = [w.lower() for w in WORD_RE.findall(line)]
+    if words and not NUMBER_RE.search(line) and all(w in UI_WORDS for w in words):
+        return True
+    return bool(BOILERPLATE_RE.search(line))
+
+
+def content_words(line):
+    return {w.lower() for w in WORD_RE.findall(line) if len(w) > 2}
+
+
+def reduce(text, budget=TOKEN_BUDGET):
+    """Cleaned text of an OCR result, within budget tokens (estimated)."""
+    raw = [line.strip() for line in (text or "").splitlines()]
+    raw = [line for line in raw if line]
+
+    lines, seen = [], set()
+    for line in raw:
+        line = " ".join(line.split())
+        key = KEY_RE.sub(" ", line).strip().lower()
+        if key in seen or is_garbage(line) or is_boilerplate(line):
+            continue
+        seen.add(key)
+        lines.append(line)
+
+    kept = len(lines)
+    tokens = [estimate_tokens(line) + 1 for line in lines]  # + the newline
+    if sum(tokens) > budget:
+        # lines a word appears in: common words (headers, repeated labels) say little
+        frequency = {}
+        for line in lines:
+            for word in content_words(line):
+                frequency[word] = frequency.get(word, 0) + 1
+        scores = [
+            (sum(1 / frequency[w] for w in content_words(line)) + 0.5 * len(NUMBER_RE.findall(line))) / cost
+            for line, cost in zip(lines, tokens)
+        ]
+        ranked = sorted(range(len(lines)), key=lambda i: (-scores[i], i))
+        best = ranked[0]
+        if tokens[best] > budget > 1:
+            # the best line alone is over budget: cut it at a word to fit
+            head = lines[best][:(budget - 1) * CHARS_PER_TOKEN - 1]
+            if " " in head:
+                head = head.rsplit(" ", 1)[0]
+            lines[best] = head.rstrip() + "…"
+            tokens[best] = estimate_tokens(lines[best]) + 1
+        keep, spent = set(), 0
+        for i in ranked:
+            if spent + tokens[i] <= budget:
+                keep.add(i)
+                spent += tokens[i]
+        lines = [line for i, line in enumerate(lines) if i in keep]
+        if lines and len(lines) < kept:
+            lines.append(f"[{kept - len(lines)} more lines not shown]")
+            kept = len(lines) - 1
+        elif not lines:
+            kept = 0
+
+    result = "\n".join(lines)
+    return Reduced(result, len(raw), kept, estimate_tokens("\n".join(raw)), estimate_tokens(result))
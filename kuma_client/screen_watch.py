@@ -0,0 +1,133 @@
+# screen_watch.py
+"""
+Change detection for the screen-watch mode of capture_and_analyze.
+
+Every frame is cut into a grid of tiles and each tile gets a 64-bit
+difference hash (dHash): the tile shrunk to 9x8 pixels, one bit per
+"is this pixel brighter than its left neighbour". All tile hashes come
+from one resize and a few array operations. A frame whose tiles all
+match the last OCRed state is skipped outright. Otherwise only the
+changed tiles (merged into rectangles, plus a margin so lines aren't cut)
+are OCRed, and only lines that weren't seen before are reported.
+"""
+import re
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_W, HASH_H = 9, 8
+SPACE_RE = re.compile(r"\s+")
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def tile_hashes(image, tile=(96, 48)):
+    """dHash of every tile, as an array of shape (rows, cols, 8) of bytes."""
+    cols = max(1, -(-image.width // tile[0]))
+    rows = max(1, -(-image.height // tile[1]))
+    small = np.asarray(image.convert("L").resize((cols * HASH_W, rows * HASH_H), Image.BILINEAR),
+                       dtype=np.int16)
+    grid = small.reshape(rows, HASH_H, cols, HASH_W).transpose(0, 2, 1, 3)
+    bits = grid[..., 1:] > grid[..., :-1]  # (rows, cols, 8, 8)
+    return np.packbits(bits.reshape(rows, cols, 64), axis=-1)
+
+
+def hash_distance(a, b):
+    """Per-tile Hamming distance between two tile_hashes() arrays."""
+    return POPCOUNT[np.bitwise_xor(a, b)].sum(axis=-1)
+
+
+def changed_regions(changed, size, margin=1):
+    """Pixel boxes (left, top, right, bottom) covering the changed tiles.
+
+    Consecutive tile rows with changes form one band; each band spans the
+    changed columns. Boxes grow by margin tiles on every side.
+    """
+    rows, cols = changed.shape
+    tile_w, tile_h = size[0] / cols, size[1] / rows
+    boxes = []
+    active = np.flatnonzero(changed.any(axis=1))
+    if not len(active):
+        return boxes
+    # split the changed rows into runs of consecutive rows
+    runs = np.split(active, np.flatnonzero(np.diff(active) > 1) + 1)
+    for run in runs:
+        columns = np.flatnonzero(changed[run].any(axis=0))
+        r0, r1 = max(run[0] - margin, 0), min(run[-1] + 1 + margin, rows)
+        c0, c1 = max(columns[0] - margin, 0), min(columns[-1] + 1 + margin, cols)
+        boxes.append((round(c0 * tile_w), round(r0 * tile_h),
+                      round(c1 * tile_w), round(r1 * tile_h)))
+    return boxes
+
+
+def line_key(line):
+    return SPACE_RE.sub(" ", line).strip().lower()
+
+
+class ScreenWatcher:
+    """Feed it frames; it returns the lines of text that are new on screen.
+
+    ocr(image, title) -> str does the reading (e.g. ocr_pipeline.ocr).
+    """
+
+    def __init__(self, ocr, tile=(96, 48), min_bits=3, margin=1, min_chars=3, max_known=5000):
+        self.ocr = ocr
+        self.tile = tile
+        self.min_bits = min_bits
+        self.margin = margin
+        self.min_chars = min_chars
+        self.max_known = max_known
+        self.title = None
+        self.size = None
+        self.hashes = None
+        self.known = OrderedDict()  # line key -> None, oldest first
+        self.frames = 0
+        self.skipped = 0
+        self.ocr_pixels = 0
+        self.frame_pixels = 0
+
+    def reset(self):
+        self.title = self.size = self.hashes = None
+        self.known.clear()
+
+    def update(self, image, title=""):
+        """New lines in this frame (possibly none)."""
+        self.frames += 1
+        self.frame_pixels += image.width * image.height
+        hashes = tile_hashes(image, self.tile)
+
+        if title != self.title or image.size != self.size:
+            # another window (or a resize): read all of it
+            self.reset()
+            self.title, self.size = title, image.size
+            boxes = [(0, 0, image.width, image.height)]
+            self.hashes = hashes
+        else:
+            changed = hash_distance(hashes, self.hashes) >= self.min_bits
+            if not changed.any():
+                self.skipped += 1
+                return []
+            boxes = changed_regions(changed, image.size, self.margin)
+            # unchanged tiles keep their old hash, so slow drift still adds up
+            self.hashes = np.where(changed[..., None], hashes, self.hashes)
+
+        new_lines = []
+        for box in boxes:
+            self.ocr_pixels += (box[2] - box[0]) * (box[3] - box[1])
+            for line in self.ocr(image.crop(box), title).splitlines():
+                key = line_key(line)
+                if len(key) < self.min_chars or key in self.known:
+                    continue
+                self.known[key] = None
+                new_lines.append(line.strip())
+        while len(self.known) > self.max_known:
+            self.known.popitem(last=False)
+        return new_lines
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "ocr_share": round(self.ocr_pixels / self.frame_pixels, 3) if self.frame_pixels else 0.0,
+            "known_lines": len(self.known),
+        }
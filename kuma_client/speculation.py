@@ -0,0 +1,130 @@
+# speculation.py
+"""
+Speculative backend requests from partial transcripts.
+
+While the user is still speaking (or in the silence before the phrase is
+declared over), the partial transcript often already is the final one.
+Once the same partial has been seen stable_partials times in a row, the
+request is started in the background with {"speculative": true}. When
+the final transcript arrives:
+
+  - it matches: the request is committed (POST /query/commit) and its
+    reply, possibly already partly generated, is handed over;
+  - it differs: the request is cancelled (POST /query/cancel), which
+    stops its model call, and the caller sends the final text as usual.
+
+The backend only remembers a speculative turn once it is committed.
+Requests go through the shared backend_client.BackendClient; nothing is
+speculated while its circuit is open.
+"""
+import queue
+import threading
+import uuid
+
+import local_intents
+
+# the backend's cache normalisation: case/punctuation changes don't count
+normalize = local_intents.load_backend_module("response_cache").normalize_prompt
+
+END = object()
+
+
+class Speculation:
+    def __init__(self, text, key):
+        self.text = text
+        self.key = key
+        self.request_id = f"spec-{uuid.uuid4().hex[:12]}"
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+
+
+class Speculator:
+    def __init__(self, client, stable_partials=2, min_chars=3, timeout=30):
+        self.client = client
+        self.stable_partials = stable_partials
+        self.min_chars = min_chars
+        self.timeout = timeout
+        self.current = None
+        self.last_key = None
+        self.seen = 0
+        self.started = 0
+        self.hits = 0
+
+    def partial(self, text):
+        """Feed the latest partial transcript."""
+        key = normalize(text or "")
+        if key != self.last_key:
+            self.last_key, self.seen = key, 0
+        self.seen += 1
+        if len(key) < self.min_chars or self.seen < self.stable_partials or not self.client.available():
+            return
+        if self.current and self.current.key == key:
+            return
+        self.cancel()
+        self.last_key, self.seen = key, self.stable_partials
+        self.current = Speculation(text, key)
+        self.started += 1
+        threading.Thread(target=self._run, args=(self.current,), daemon=True).start()
+
+    def cancel(self):
+        """Drop the running speculation, if any (e.g. the phrase was handled locally)."""
+        spec, self.current = self.current, None
+        self.last_key, self.seen = None, 0
+        if spec:
+            spec.cancelled.set()
+            threading.Thread(target=self._post, args=("/query/cancel", spec.request_id), daemon=True).start()
+
+    def finish(self, text, on_sentence=None):
+        """Take over the speculation if it matches the final transcript.
+
+        Returns the reply (sentences go to on_sentence as they arrive), or
+        None when there was no usable speculation and the caller should
+        send text itself.
+        """
+        spec = self.current
+        if spec is None or spec.key != normalize(text):
+            self.cancel()
+            return None
+        self.current, self.last_key, self.seen = None, None, 0
+        self._post("/query/commit", spec.request_id)
+
+        sentences = []
+        while True:
+            event = spec.events.get()
+            if event is END:
+                break
+            kind = event.get("type")
+            if kind == "sentence":
+                sentence = event.get("text", "").strip()
+                if sentence:
+                    sentences.append(sentence)
+                    if on_sentence:
+                        on_sentence(sentence)
+            elif kind == "done":
+                break
+            elif kind in ("refused", "cancelled") or (kind == "error" and not sentences):
+                return None  # nothing was said yet: let the caller ask normally
+        self.hits += 1
+        print(f"🔮 Speculation used ({self.hits}/{self.started})")
+        return " ".join(sentences)
+
+    def _run(self, spec):
+        # a guess is not worth retrying: the final transcript will be sent anyway
+        events = self.client.stream(spec.text, timeout=(3.05, self.timeout), retries=0,
+                                    request_id=spec.request_id, speculative=True)
+        try:
+            for event in events:
+                if spec.cancelled.is_set():
+                    return
+                spec.events.put(event)
+        except Exception as e:
+            spec.events.put({"type": "error", "message": str(e)})
+        finally:
+            events.close()
+            spec.events.put(END)
+
+    def _post(self, path, request_id):
+        try:
+            self.client.post_json(path, {"request_id": request_id}, timeout=5, retries=1)
+        except Exception as e:
+            print(f"⚠️ Speculation control failed: {e}")
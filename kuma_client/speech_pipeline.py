@@ -0,0 +1,123 @@
+# speech_pipeline.py
+"""
+Sentence-pipelined speech output.
+
+    say(text) -> sentences -> synthesis thread -> playback thread
+
+Text is split into sentences. One thread synthesizes them in order and
+stays lookahead sentences ahead of a second thread that plays them, so
+sentence N+1 is being fetched while sentence N is heard, and a long reply
+starts after one sentence's synthesis instead of the whole reply's.
+
+say() returns a Speech handle whose wait() returns once the last sentence
+has actually finished playing (play() blocks until the audio has been
+played), so callers don't guess with sleeps.
+"""
+import queue
+import re
+import threading
+import time
+import traceback
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_END.split(text or "") if s.strip()]
+
+
+def speakable(sentence):
+    """False for fragments with no letters ("😂", "..."): nothing to say."""
+    return any(ch.isalpha() for ch in sentence)
+
+
+class Speech:
+    """One say() call: done once every sentence has been played."""
+
+    def __init__(self, text, sentences):
+        self.text = text
+        self.sentences = sentences
+        self.created = time.perf_counter()
+        self.first_audio = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def timings(self):
+        """Milliseconds from say() to the first sound and to the end."""
+        timings = {}
+        if self.first_audio is not None:
+            timings["tts_first_audio"] = (self.first_audio - self.created) * 1000
+        if self.finished is not None:
+            timings["tts_total"] = (self.finished - self.created) * 1000
+        return timings
+
+    def _finish(self):
+        self.finished = time.perf_counter()
+        self.done.set()
+
+
+class SpeechPipeline:
+    """synthesize(sentence) -> audio (None to skip); play(audio) blocks until played."""
+
+    def __init__(self, synthesize, play, lookahead=1):
+        self.synthesize = synthesize
+        self.play = play
+        self.texts = queue.Queue()
+        # bounded: synthesis runs at most lookahead sentences ahead of playback
+        self.audio = queue.Queue(maxsize=lookahead)
+        self.last = None
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        if self.threads:
+            return self
+        for target, name in ((self._synthesize_loop, "kuma-tts-synth"), (self._play_loop, "kuma-tts-play")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def say(self, text):
+        """Queue text to be spoken after everything queued before it."""
+        speech = Speech(text, split_sentences(text))
+        if not speech.sentences:
+            speech._finish()
+            return speech
+        with self.lock:
+            self.last = speech
+            for i, sentence in enumerate(speech.sentences):
+                self.texts.put((speech, sentence, i == len(speech.sentences) - 1))
+        return speech
+
+    def wait(self, timeout=None):
+        """Block until everything queued so far has been played."""
+        with self.lock:
+            last = self.last
+        return last.wait(timeout) if last else True
+
+    def _synthesize_loop(self):
+        while True:
+            speech, sentence, last = self.texts.get()
+            try:
+                audio = self.synthesize(sentence)
+            except Exception:
+                traceback.print_exc()
+                audio = None
+            self.audio.put((speech, audio, last))
+
+    def _play_loop(self):
+        while True:
+            speech, audio, last = self.audio.get()
+            if audio is not None:
+                if speech.first_audio is None:
+                    speech.first_audio = time.perf_counter()
+                try:
+                    self.play(audio)
+                except Exception:
+                    traceback.print_exc()
+            if last:
+                speech._finish()
@@ -0,0 +1,121 @@
+# stt.py
+"""
+Speech-to-text engines behind one small interface, so the voice client
+can switch between cloud and offline recognizers.
+
+    session = engine.session()          # one per phrase
+    session.partial(audio)   -> best guess so far, or None
+    session.final(audio)     -> final transcript, "" if nothing was understood
+
+audio is a speech_recognition AudioData holding everything heard so far
+in the phrase (see audio_stream.Listener's partial_ms). engine.partials
+says whether partial() ever returns text. STTError means the engine
+itself failed (network, quota), as opposed to not understanding.
+
+    KUMA_STT=google   cloud; partials only with KUMA_STT_PARTIALS=1, which
+                      re-sends the phrase so far on every update
+    KUMA_STT=vosk     offline, native partial results; needs the optional
+                      vosk package and a model directory in KUMA_VOSK_MODEL
+"""
+import json
+import os
+
+import speech_recognition as sr
+
+try:
+    import vosk
+except ImportError:  # optional: only needed for KUMA_STT=vosk
+    vosk = None
+
+
+class STTError(Exception):
+    """The recognizer could not be reached or refused the request."""
+
+
+class GoogleSTT:
+    def __init__(self, partials=False, language="en-US"):
+        self.partials = partials
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, audio):
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise STTError(str(e)) from e
+
+    def session(self):
+        return GoogleSession(self)
+
+
+class GoogleSession:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def partial(self, audio):
+        if not self.engine.partials:
+            return None
+        try:
+            return self.engine.recognize(audio) or None
+        except STTError:
+            return None  # a missed partial only costs the speculation
+
+    def final(self, audio):
+        return self.engine.recognize(audio)
+
+
+class VoskSTT:
+    partials = True
+    sample_rate = 16000
+
+    def __init__(self, model_path):
+        if vosk is None:
+            raise STTError("KUMA_STT=vosk needs the vosk package (pip install vosk)")
+        if not model_path or not os.path.isdir(model_path):
+            raise STTError(f"Vosk model not found: {model_path!r} (set KUMA_VOSK_MODEL)")
+        vosk.SetLogLevel(-1)
+        self.model = vosk.Model(model_path)
+
+    def session(self):
+        return VoskSession(self)
+
+
+class VoskSession:
+    """Feeds only the audio that is new since the last call."""
+
+    def __init__(self, engine):
+        self.recognizer = vosk.KaldiRecognizer(engine.model, engine.sample_rate)
+        self.sample_rate = engine.sample_rate
+        self.fed = 0
+        self.done = []  # text of segments Vosk has already finalized
+
+    def _feed(self, audio):
+        pcm = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        chunk, self.fed = pcm[self.fed:], len(pcm)
+        if chunk and self.recognizer.AcceptWaveform(chunk):
+            self._keep(json.loads(self.recognizer.Result()).get("text", ""))
+
+    def _keep(self, text):
+        if text:
+            self.done.append(text)
+
+    def partial(self, audio):
+        self._feed(audio)
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(self.done + ([partial] if partial else [])) or None
+
+    def final(self, audio):
+        self._feed(audio)
+        self._keep(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        return " ".join(self.done)
+
+
+def from_env():
+    name = os.getenv("KUMA_STT", "google")
+    if name == "vosk":
+        return VoskSTT(os.getenv("KUMA_VOSK_MODEL"))
+    if name == "google":
+        return GoogleSTT(partials=os.getenv("KUMA_STT_PARTIALS", "0") == "1")
+    raise STTError(f"unknown KUMA_STT engine {name!r} (google or vosk)")
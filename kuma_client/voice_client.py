@@ -1,13 +1,20 @@
-import requests
-import speech_recognition as sr
+import io
 import pyttsx3
 import time
 import sys
-import webbrowser
-from datetime import datetime
 from win10toast import ToastNotifier
-import geocoder
 import os
+import uuid
+from pydub import AudioSegment
+from pydub.playback import play
+
+import audio_stream
+import backend_client
+import local_intents
+import speculation
+import speech_pipeline
+import stt
+import wake_word
 
 # ============================================================
 # ⚙️ CONFIG
@@ -16,21 +23,62 @@ USE_CLOUD_AI = True   # ⬅️ False = fully offline mode
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "sk-")
 OPENAI_MODEL = "gpt-4o-mini"
 OPENAI_TTS_VOICE = "alloy"
-BASE_URL = "http://127.0.0.1:8000"
-
-QUERY_URL = f"{BASE_URL}/query"
-MEMORY_URL = f"{BASE_URL}/memory"
-CLEAR_MEMORY_URL = f"{BASE_URL}/memory/clear"
+OPENAI_TTS_MODEL = "gpt-4o-mini-tts"
+# One conversation per run, kept separate from the other Kuma clients
+SESSION_ID = f"voice-{uuid.uuid4().hex[:12]}"
+# Backend address: KUMA_BACKEND_URL (see backend_client.py)
+backend = backend_client.BackendClient(session_id=SESSION_ID)
+# Comma-separated WAV files to use instead of the microphone (for testing)
+AUDIO_INPUT = os.getenv("KUMA_AUDIO_INPUT", "")
+# "auto" (WebRTC VAD if installed), "webrtc" or "energy"
+VAD_MODE = os.getenv("KUMA_VAD", "auto")
+# Wake word: spotted offline when templates exist (see wake_word.py),
+# otherwise every idle phrase is transcribed and searched for these
+WAKE_WORDS = ["onepiece", "one piece", "on piece", "one peas"]
+WAKE_SENSITIVITY = float(os.getenv("KUMA_WAKE_SENSITIVITY", "0.5"))
+# Start the backend request from a stable partial transcript, before the
+# phrase is over (needs an STT engine with partials, see stt.py)
+SPECULATE = os.getenv("KUMA_SPECULATE", "1") == "1"
+PARTIAL_MS = 300
+# Synthesized speech is cached on disk, in the same place as the backend's
+TTS_CACHE_MB = float(os.getenv("KUMA_TTS_CACHE_MB", "64"))
+# Said as-is by this client: fetched once at startup, then always from the cache
+STATIC_PHRASES = [
+    "Aye aye, Captain! Kuma AI is ready to sail!",
+    "Aye aye, Captain! I’m listening.",
+    "Didn’t catch that, Captain.",
+    "Aye Captain, entering sleep mode.",
+    "Could not retrieve memory, Captain.",
+    "I don't remember anything yet, Captain.",
+    "Here's what I remember, Captain.",
+    "That’s all I remember, Captain!",
+    "All memories cleared, Captain. Fresh start!",
+    "Failed to clear memory, Captain.",
+    "Backend not reachable, Captain.",
+]
 
 # ============================================================
 # 🗣️ TTS Setup
 # ============================================================
-engine = pyttsx3.init()
-engine.setProperty("rate", 175)
-engine.setProperty("volume", 1.0)
-voices = engine.getProperty("voices")
-if voices:
-    engine.setProperty("voice", voices[0].id)
+# created on first use, on the playback thread that runs it
+engine = None
+
+
+def get_engine():
+    global engine
+    if engine is None:
+        engine = pyttsx3.init()
+        engine.setProperty("rate", 175)
+        engine.setProperty("volume", 1.0)
+        voices = engine.getProperty("voices")
+        if voices:
+            engine.setProperty("voice", voices[0].id)
+    return engine
+
+
+audio_cache = local_intents.load_backend_module("audio_cache")
+tts_cache = audio_cache.AudioCache(os.getenv("KUMA_TTS_CACHE_DIR", audio_cache.DEFAULT_DIR),
+                                   max_bytes=int(TTS_CACHE_MB * 1024 * 1024))
 
 notifier = ToastNotifier()
 
@@ -45,179 +93,285 @@ def notify(title, message):
 
 def speak_pyttsx3(text):
     try:
-        engine.say(text)
-        engine.runAndWait()
+        tts = get_engine()
+        tts.say(text)
+        tts.runAndWait()
     except Exception as e:
         print(f"⚠️ pyttsx3 failed: {e}")
 
 
-def speak_openai_tts(text):
+def fetch_openai_tts(text):
+    """MP3 bytes for text from the OpenAI TTS API."""
+    import openai
+    openai.api_key = OPENAI_API_KEY
+    response = openai.audio.speech.create(
+        model=OPENAI_TTS_MODEL,
+        voice=OPENAI_TTS_VOICE,
+        input=text
+    )
+    return response.read()
+
+
+def synthesize_sentence(text):
+    """Decoded audio for one sentence, or the text itself for pyttsx3."""
+    if not speech_pipeline.speakable(text):
+        return None
+    if not USE_CLOUD_AI:
+        return text
     try:
-        import openai
-        openai.api_key = OPENAI_API_KEY
-        from pathlib import Path
-        speech_path = Path("response.mp3")
-        response = openai.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice=OPENAI_TTS_VOICE,
-            input=text
-        )
-        response.stream_to_file(speech_path)
-        os.system(f'start {speech_path}')
+        mp3 = tts_cache.get_or_create(text, OPENAI_TTS_VOICE, OPENAI_TTS_MODEL, lambda: fetch_openai_tts(text))
+        return AudioSegment.from_file(io.BytesIO(mp3), format="mp3")
     except Exception as e:
         print(f"⚠️ OpenAI TTS failed: {e}")
-        speak_pyttsx3(text)
+        return text
+
+
+def play_sentence(audio):
+    # don't transcribe our own voice
+    with get_listener().muted():
+        if isinstance(audio, str):
+            speak_pyttsx3(audio)
+        else:
+            play(audio)
+
 
+# sentence N+1 is synthesized while sentence N plays
+voice = speech_pipeline.SpeechPipeline(synthesize_sentence, play_sentence).start()
 
-def speak(text, delay_after=0.4):
+
+def speak(text, wait=True):
+    """Say text; with wait=False it is only queued behind what is already
+    being said (call voice.wait() to block until everything was heard)."""
     print(f"\n🧠 Kuma: {text}")
     notify("🧠 Kuma", text)
-    if USE_CLOUD_AI:
-        speak_openai_tts(text)
-    else:
-        speak_pyttsx3(text)
-    time.sleep(delay_after)
+    speech = voice.say(text)
+    if wait:
+        speech.wait()
+        log_timings(speech.timings())
+    return speech
+
+
+def say_sentence(text):
+    """on_sentence callback for streamed replies: queue, don't wait."""
+    speak(text, wait=False)
+
+
+def log_timings(timings):
+    """Print stage durations (milliseconds) on one line."""
+    if timings:
+        print("⏱️ " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in timings.items()))
 
 
 # ============================================================
 # 🎙️ Speech Recognition
 # ============================================================
-def listen(prompt_msg="Listening..."):
-    recognizer = sr.Recognizer()
-    recognizer.energy_threshold = 200
-    recognizer.dynamic_energy_threshold = True
+stt_engine = stt.from_env()
+speculator = speculation.Speculator(backend)
+listener = None
 
-    with sr.Microphone() as source:
-        print(f"\n🎙️ {prompt_msg}")
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        audio = recognizer.listen(source, phrase_time_limit=8)
 
+def get_listener():
+    """The capture pipeline, started on first use and kept for the whole run."""
+    global listener
+    if listener is None:
+        if AUDIO_INPUT:
+            source = audio_stream.WavSource(AUDIO_INPUT.split(","), realtime=True)
+        else:
+            source = audio_stream.MicrophoneSource()
+        partial_ms = PARTIAL_MS if SPECULATE and stt_engine.partials else 0
+        listener = audio_stream.Listener(source, vad=VAD_MODE, max_utterance_s=8, partial_ms=partial_ms)
+        listener.start()
+    return listener
+
+
+def next_utterance(prompt_msg):
+    print(f"\n🎙️ {prompt_msg}")
+    while True:
+        utterance = get_listener().get()
+        if utterance is None:
+            print("🎧 Audio input ended.")
+            sys.exit(0)
+        if utterance.final:
+            return utterance
+
+
+def transcribe(audio, session=None):
     try:
-        text = recognizer.recognize_google(audio)
-        print(f"🗣️ You said: {text}")
-        return text.lower()
-    except sr.UnknownValueError:
-        print("❌ Couldn’t understand.")
-        return ""
-    except sr.RequestError:
+        start = time.perf_counter()
+        text = (session or stt_engine.session()).final(audio)
+        log_timings({"stt": (time.perf_counter() - start) * 1000})
+    except stt.STTError:
         print("⚠️ Speech service error.")
         return ""
+    if not text:
+        print("❌ Couldn’t understand.")
+        return ""
+    print(f"🗣️ You said: {text}")
+    return text.lower()
+
+
+def listen(prompt_msg="Listening..."):
+    """Next phrase from the continuous capture stream, as lower-case text.
+
+    The microphone stays open between calls, so anything said while the
+    previous phrase was being recognized or answered is already queued.
+    """
+    return transcribe(next_utterance(prompt_msg).audio)
+
+
+def listen_for_command(prompt_msg):
+    """Like listen(), but while the phrase is still being spoken its partial
+    transcripts are fed to the speculator, which may start the backend
+    request early. The caller settles it with speculator.finish()."""
+    speculator.cancel()  # a guess for an earlier phrase is stale by now
+    print(f"\n🎙️ {prompt_msg}")
+    session = stt_engine.session()
+    while True:
+        utterance = get_listener().get()
+        if utterance is None:
+            print("🎧 Audio input ended.")
+            sys.exit(0)
+        if utterance.final:
+            return transcribe(utterance.audio, session)
+        if get_listener().pending():
+            continue  # a newer snapshot is already waiting
+        partial = session.partial(utterance.audio)
+        if partial:
+            print(f"💭 {partial}")
+            speculator.partial(partial)
+
+
+wake_spotter = wake_word.WakeWordSpotter.from_dir(sensitivity=WAKE_SENSITIVITY)
+if wake_spotter is None:
+    print("⚠️ No wake word templates; idle phrases go to cloud STT (python wake_word.py enroll)")
+
+
+def heard_wake_word():
+    """Wait for the next phrase and say whether it holds the wake word.
+    With templates this never leaves the machine."""
+    audio = next_utterance("🎙️ Waiting for wake word...").audio
+    if wake_spotter is None:
+        return any(w in transcribe(audio) for w in WAKE_WORDS)
+    start = time.perf_counter()
+    score = wake_spotter.score(audio)
+    log_timings({"wake": (time.perf_counter() - start) * 1000})
+    return score <= wake_spotter.threshold
 
 
 # ============================================================
 # 🌦️ Weather Helper
 # ============================================================
+# Same cached, single-flight provider the backend uses
+weather = local_intents.load_backend_module("weather").WeatherProvider()
+
+
 def get_weather():
-    try:
-        g = geocoder.ip('me')
-        city = g.city or g.state or "your area"
-    except Exception:
-        city = "your area"
-    try:
-        resp = requests.get("https://wttr.in/?format=3", timeout=6)
-        if resp.status_code == 200:
-            return f"The current weather in {city} is: {resp.text}"
-        else:
-            return f"Couldn't fetch weather for {city}."
-    except Exception:
-        return "Couldn't fetch weather right now."
+    city = weather.city()
+    forecast = weather.forecast()
+    if forecast:
+        return f"The current weather in {city} is: {forecast}"
+    return f"Couldn't fetch weather for {city} right now."
 
 
 # ============================================================
 # ⚙️ Local Handling
 # ============================================================
+local_intents.register_action("weather", lambda intent, text, match: get_weather())
+
+
 def local_handle(text):
-    t = text.lower()
-    if "time" in t:
-        return datetime.now().strftime("It's %I:%M %p, Captain.")
-    if "date" in t:
-        return datetime.now().strftime("Today is %A, %B %d, %Y, Captain.")
-    if "weather" in t or "temperature" in t:
-        return get_weather()
-    if "joke" in t:
-        return "Why did the pirate bring a bar of soap? Because he wanted to wash ashore! 😂"
-    if "open youtube" in t:
-        webbrowser.open("https://youtube.com")
-        return "Opened YouTube for you, Captain."
-    if "open tradingview" in t:
-        webbrowser.open("https://www.tradingview.com")
-        return "Opened TradingView for you, Captain."
-    if "open steam" in t:
-        webbrowser.open("steam://open/main")
-        return "Attempting to open Steam, Captain."
-    if "open google" in t:
-        webbrowser.open("https://www.google.com")
-        return "Opened Google for you, Captain."
-    return None
+    """Offline fallback: answer anything the shared intent table can do here."""
+    return local_intents.handle(text, offline=True)
 
 
 # ============================================================
 # 🧠 Backend Communication
 # ============================================================
-def send_to_backend(command):
+def send_to_backend(command, on_sentence=None):
+    """Stream the reply from the backend.
+
+    Each sentence is handed to on_sentence as soon as it arrives, so the
+    first one can be spoken while the rest is still being generated.
+    Returns the full reply text.
+    """
+    def emit(text):
+        if on_sentence and text:
+            on_sentence(text)
+        return text
+
     try:
-        response = requests.post(QUERY_URL, json={"text": command}, timeout=10)
-        if response.status_code == 200:
-            return response.json().get("reply", "").strip()
-        else:
-            return f"Server error {response.status_code}, Captain."
-    except requests.exceptions.ConnectionError:
+        reply, timings = backend.stream_reply(command, on_sentence=on_sentence)
+        # backend stage durations for this turn
+        log_timings(timings)
+        return reply
+    except backend_client.BackendUnavailable:
+        # down, or the circuit is open: answer what we can right here
         fallback = local_handle(command)
         if fallback:
-            return fallback
-        return "Backend not reachable, Captain."
+            return emit(fallback)
+        return emit("Backend not reachable, Captain.")
+    except backend_client.BackendError as e:
+        if e.status:
+            return emit(f"Server error {e.status}, Captain.")
+        return emit(str(e) or "Error contacting AI, Captain.")
     except Exception as e:
         fallback = local_handle(command)
         if fallback:
-            return fallback
-        return f"Error contacting backend: {e}"
+            return emit(fallback)
+        return emit(f"Error contacting backend: {e}")
 
 
 def view_memory():
     try:
-        response = requests.get(MEMORY_URL, timeout=5)
-        if response.status_code != 200:
-            speak("Could not retrieve memory, Captain.")
-            return
-        data = response.json().get("memory", [])
-        if not data:
-            speak("I don't remember anything yet, Captain.")
-            return
-        speak("Here's what I remember, Captain.")
-        time.sleep(0.6)
-        for m in data[-8:]:
-            speak(m['text'], delay_after=0.8)
-        speak("That’s all I remember, Captain!")
-    except Exception:
+        data = backend.get_json("/memory", timeout=5).get("memory", [])
+    except backend_client.BackendUnavailable:
         speak("Backend not reachable, Captain.")
+        return
+    except backend_client.BackendError:
+        speak("Could not retrieve memory, Captain.")
+        return
+    if not data:
+        speak("I don't remember anything yet, Captain.")
+        return
+    speak("Here's what I remember, Captain.", wait=False)
+    for m in data[-8:]:
+        speak(m['text'], wait=False)
+    speak("That’s all I remember, Captain!")
 
 
 def clear_memory():
     try:
-        response = requests.post(CLEAR_MEMORY_URL, timeout=5)
-        if response.status_code == 200:
-            return "All memories cleared, Captain. Fresh start!"
-        return "Failed to clear memory, Captain."
-    except Exception:
+        backend.post_json("/memory/clear", timeout=5)
+        return "All memories cleared, Captain. Fresh start!"
+    except backend_client.BackendUnavailable:
         return "Backend not reachable, Captain."
+    except backend_client.BackendError:
+        return "Failed to clear memory, Captain."
 
 
 # ============================================================
 # 🚀 MAIN LOOP (Now supports FREE TALK)
 # ============================================================
+def prewarm_tts():
+    """Fetch the fixed phrases and local intent replies in the background,
+    sentence by sentence: the pipeline looks the cache up per sentence."""
+    if USE_CLOUD_AI:
+        replies = [i.get("reply") for i in local_intents.matcher.intents if i.get("client") and i.get("reply")]
+        sentences = [s for phrase in STATIC_PHRASES + replies
+                     for s in speech_pipeline.split_sentences(phrase) if speech_pipeline.speakable(s)]
+        tts_cache.prewarm(sentences, OPENAI_TTS_VOICE, OPENAI_TTS_MODEL, fetch_openai_tts)
+
+
 def main():
-    wake_words = ["onepiece", "one piece", "on piece", "one peas"]
+    prewarm_tts()
     speak("Aye aye, Captain! Kuma AI is ready to sail!")
 
     while True:
-        command = listen("🎙️ Waiting for wake word...")
-
-        if any(w in command for w in wake_words):
+        if heard_wake_word():
             speak("Aye aye, Captain! I’m listening.")
-            time.sleep(0.6)
 
             while True:
-                cmd = listen("🎙️ You may speak freely, Captain (say 'sleep' to stop)...")
+                cmd = listen_for_command("🎙️ You may speak freely, Captain (say 'sleep' to stop)...")
 
                 if not cmd:
                     speak("Didn’t catch that, Captain.")
@@ -236,9 +390,20 @@ def main():
                     speak(reply)
                     continue
 
-                # 🧠 Free talk or task execution
-                reply = send_to_backend(cmd)
-                speak(reply)
+                # ⚡ Purely local intents never leave this machine
+                reply = local_intents.handle(cmd)
+                if reply:
+                    speak(reply)
+                    continue
+
+                # 🔮 The reply may already be on its way from a partial transcript
+                if speculator.finish(cmd, on_sentence=say_sentence) is not None:
+                    voice.wait()
+                    continue
+
+                # 🧠 Free talk or task execution (spoken sentence by sentence)
+                send_to_backend(cmd, on_sentence=say_sentence)
+                voice.wait()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+# wake_word.py
+"""
+Offline wake-word spotter: decides locally whether a phrase contains the
+wake word, so idle audio never goes to cloud STT.
+
+Each phrase is turned into MFCC features (NumPy only), then compared with
+a few recorded examples of the wake word ("templates") by subsequence
+dynamic time warping. The wake word may appear anywhere in the phrase.
+The smallest length-normalized distance over all templates is the score;
+the phrase is a wake word if the score is under the threshold.
+
+The threshold is calibrated from the templates themselves (how far each
+one is from the nearest other) and scaled by sensitivity in [0, 1]:
+0.5 allows ~1.4x that distance, and every 0.25 step up or down
+multiplies or divides the threshold by another sqrt(2).
+
+Templates are 16-bit mono WAVs in KUMA_WAKE_TEMPLATES (default
+kuma_client/wake_templates/). Record some with:
+    python wake_word.py enroll 5
+and measure the error rates with eval_wake_word.py.
+"""
+import glob
+import os
+import sys
+import wave
+from functools import lru_cache
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+TEMPLATES_DIR = os.getenv(
+    "KUMA_WAKE_TEMPLATES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "wake_templates"))
+DEFAULT_THRESHOLD = 0.6  # used when there are too few templates to calibrate
+
+
+# ============================================================
+# 🎛️ Features
+# ============================================================
+@lru_cache(maxsize=8)
+def mel_filterbank(sample_rate, n_fft, n_mels):
+    """Triangular filters on the mel scale, shape (n_mels, n_fft // 2 + 1)."""
+    def to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+
+    def to_hz(mel):
+        return 700 * (10 ** (mel / 2595) - 1)
+
+    mels = np.linspace(to_mel(20), to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * to_hz(mels) / sample_rate).astype(int)
+    fbank = np.zeros((n_mels, n_fft // 2 + 1))
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            fbank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            fbank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return fbank
+
+
+@lru_cache(maxsize=8)
+def dct_matrix(n_in, n_out):
+    """Orthonormal DCT-II rows 1..n_out (c0, overall loudness, is dropped)."""
+    k = np.arange(1, n_out + 1)[:, None]
+    n = np.arange(n_in)[None, :]
+    return np.sqrt(2 / n_in) * np.cos(np.pi * k * (2 * n + 1) / (2 * n_in))
+
+
+def mfcc(samples, sample_rate=SAMPLE_RATE, win_ms=25, hop_ms=10, n_fft=512, n_mels=26, n_ceps=12):
+    """MFCCs of int16 or float samples, shape (frames, n_ceps).
+
+    No per-phrase mean/variance normalization: a phrase holds more than
+    the wake word, so its statistics would shift with the other words."""
+    x = np.asarray(samples, dtype=np.float64)
+    x = np.append(x[0], x[1:] - 0.97 * x[:-1]) if len(x) else x  # pre-emphasis
+    win = sample_rate * win_ms // 1000
+    hop = sample_rate * hop_ms // 1000
+    if len(x) < win:
+        x = np.pad(x, (0, win - len(x)))
+    frames = np.lib.stride_tricks.sliding_window_view(x, win)[::hop] * np.hamming(win)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    energies = np.log(power @ mel_filterbank(sample_rate, n_fft, n_mels).T + 1e-10)
+    return energies @ dct_matrix(n_mels, n_ceps).T
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE, frame_ms=10, above_noise_db=12, below_peak_db=35):
+    """Cut leading/trailing frames that are within above_noise_db of the
+    background level (the quietest tenth of frames) or more than
+    below_peak_db under the loudest frame."""
+    step = sample_rate * frame_ms // 1000
+    n = len(samples) // step
+    if n == 0:
+        return samples
+    frames = np.asarray(samples[:n * step], dtype=np.float64).reshape(n, step)
+    db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    floor = max(np.percentile(db, 10) + above_noise_db, db.max() - below_peak_db)
+    loud = np.flatnonzero(db > floor)
+    if len(loud) == 0:
+        return samples  # flat: no frame stands out (silence, constant tone)
+    return samples[loud[0] * step:(loud[-1] + 1) * step]
+
+
+# ============================================================
+# 🧭 Matching
+# ============================================================
+def subsequence_dtw(template, phrase):
+    """Best alignment cost of the whole template against any part of the
+    phrase, divided by the template length.
+
+    Steps are (1,1), (1,2) and (2,1), so the local tempo may vary between
+    half and double speed and every row depends only on the two before it,
+    which lets each row be computed as one vector operation.
+    """
+    n, m = len(template), len(phrase)
+    # squared Euclidean distances between all frame pairs
+    cost = (np.sum(template ** 2, axis=1)[:, None] + np.sum(phrase ** 2, axis=1)[None, :]
+            - 2 * template @ phrase.T)
+    cost = np.sqrt(np.maximum(cost, 0)) / np.sqrt(template.shape[1])
+    inf = np.inf
+    prev2 = np.full(m, inf)
+    prev = cost[0].copy()  # free start anywhere in the phrase
+    for i in range(1, n):
+        diag = np.concatenate(([inf], prev[:-1]))
+        skip = np.concatenate(([inf, inf], prev[:-2]))  # (1,2): one phrase frame skipped
+        slow = np.concatenate(([inf], prev2[:-1]))       # (2,1): one template frame repeated
+        best = np.minimum(np.minimum(diag, skip), slow + cost[i - 1])
+        prev2, prev = prev, cost[i] + best
+    return float(prev.min()) / n
+
+
+def read_wav(path):
+    """(int16 mono samples, sample rate) of a 16-bit WAV file."""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+        channels, rate = w.getnchannels(), w.getframerate()
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+def resample(samples, rate, target=SAMPLE_RATE):
+    if rate == target or len(samples) == 0:
+        return samples
+    positions = np.arange(int(len(samples) * target / rate)) * rate / target
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+
+class WakeWordSpotter:
+    def __init__(self, templates, sensitivity=0.5, threshold=None, sample_rate=SAMPLE_RATE):
+        """templates: int16 sample arrays of the wake word at sample_rate."""
+        if not templates:
+            raise ValueError("at least one wake word template is needed")
+        self.sample_rate = sample_rate
+        self.templates = [mfcc(trim_silence(t, sample_rate), sample_rate) for t in templates]
+        self.calibrated = threshold if threshold is not None else self._calibrate()
+        self.sensitivity = sensitivity
+
+    @classmethod
+    def from_dir(cls, path=TEMPLATES_DIR, **kwargs):
+        """Spotter for the WAVs in path, or None when there are none."""
+        paths = sorted(glob.glob(os.path.join(path, "*.wav")))
+        if not paths:
+            return None
+        return cls([resample(*read_wav(p)) for p in paths], **kwargs)
+
+    @property
+    def threshold(self):
+        return self.calibrated * 2 ** (2 * self.sensitivity - 0.5)
+
+    def _calibrate(self):
+        """Typical distance between two genuine utterances of the wake word:
+        the mean nearest-neighbour distance between templates."""
+        if len(self.templates) < 2:
+            return DEFAULT_THRESHOLD
+        nearest = []
+        for i, t in enumerate(self.templates):
+            nearest.append(min(subsequence_dtw(t, other)
+                               for j, other in enumerate(self.templates) if j != i))
+        return float(np.mean(nearest))
+
+    def score_samples(self, samples, sample_rate=SAMPLE_RATE):
+        """Distance of the closest template match; lower is more wake-word-like."""
+        features = mfcc(resample(samples, sample_rate, self.sample_rate), self.sample_rate)
+        return min(subsequence_dtw(t, features) for t in self.templates)
+
+    def score(self, audio):
+        """Score a speech_recognition AudioData."""
+        pcm = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        return self.score_samples(np.frombuffer(pcm, dtype=np.int16), self.sample_rate)
+
+    def detect(self, audio):
+        return self.score(audio) <= self.threshold
+
+    def detect_samples(self, samples, sample_rate=SAMPLE_RATE):
+        return self.score_samples(samples, sample_rate) <= self.threshold
+
+
+def enroll(count, path=TEMPLATES_DIR):
+    """Record count utterances of the wake word from the microphone."""
+    import audio_stream
+
+    os.makedirs(path, exist_ok=True)
+    listener = audio_stream.Listener(audio_stream.MicrophoneSource())
+    listener.start()
+    existing = len(glob.glob(os.path.join(path, "*.wav")))
+    for i in range(count):
+        print(f"🎙️ Say the wake word ({i + 1}/{count})...")
+        utterance = listener.get()
+        if utterance is None:
+            break
+        out = os.path.join(path, f"wake_{existing + i + 1:02d}.wav")
+        with wave.open(out, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(utterance.audio.sample_width)
+            w.setframerate(utterance.audio.sample_rate)
+            w.writeframes(utterance.audio.frame_data)
+        print(f"💾 Saved {out}")
+    listener.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "enroll":
+        enroll(int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    elif len(sys.argv) >= 2:
+        spotter = WakeWordSpotter.from_dir()
+        if spotter is None:
+            sys.exit(f"No templates in {TEMPLATES_DIR}; run: python wake_word.py enroll")
+        for wav in sys.argv[1:]:
+            score = spotter.score_samples(*read_wav(wav))
+            print(f"{'✅' if score <= spotter.threshold else '❌'} {score:.3f} (threshold {spotter.threshold:.3f})  {wav}")
+    else:
+        sys.exit("usage: python wake_word.py enroll [count] | python wake_word.py phrase.wav [...]")
@@ -1,29 +1,56 @@
 import tkinter as tk
 from PIL import Image, ImageTk, ImageEnhance
-import requests
 import speech_recognition as sr
 import pyttsx3
+import math
+import queue
 import threading
 import time
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "kuma_client"))
+import backend_client
+import local_intents
+import wake_word
 
 # ---------------------------------------
 # ⚙️ Config
 # ---------------------------------------
-BACKEND_URL = "http://127.0.0.1:8000/query"
+SESSION_ID = f"luffy-{uuid.uuid4().hex[:12]}"
+# Backend address: KUMA_BACKEND_URL (see kuma_client/backend_client.py)
+backend = backend_client.BackendClient(session_id=SESSION_ID)
 LUFFY_IMG = "luffy.png"
 WAKE_WORDS = ["onepiece", "one piece", "one peace", "on piece", "one peas"]
 STOP_WORDS = ["stop", "bye", "sleep", "that’s all", "that's all"]
+WAKE_SENSITIVITY = float(os.getenv("KUMA_WAKE_SENSITIVITY", "0.5"))
+ANIMATION_FPS = 24
+# mode -> (lowest, highest brightness, seconds per pulse)
+PULSES = {
+    "idle": (1.0, 1.06, 3.0),
+    "listening": (1.0, 1.2, 1.4),
+    "thinking": (0.85, 1.1, 0.9),
+    "speaking": (1.05, 1.3, 0.5),
+}
+FRAMES_PER_PULSE = 16
 
 # ---------------------------------------
 # 🔊 Voice Engine
 # ---------------------------------------
-engine = pyttsx3.init()
-engine.setProperty("rate", 180)
-engine.setProperty("volume", 1.0)
+# created on first use, by the assistant thread that runs it
+engine = None
 
-voices = engine.getProperty("voices")
-if voices:
-    engine.setProperty("voice", voices[0].id)
+def get_engine():
+    global engine
+    if engine is None:
+        engine = pyttsx3.init()
+        engine.setProperty("rate", 180)
+        engine.setProperty("volume", 1.0)
+        voices = engine.getProperty("voices")
+        if voices:
+            engine.setProperty("voice", voices[0].id)
+    return engine
 
 def speak(text):
     """Make Luffy speak like a pirate"""
@@ -33,19 +60,37 @@ def speak(text):
             .replace("your", "yer")
     )
     print(f"🧠 Luffy: {pirate_text}")
-    engine.say(pirate_text)
-    engine.runAndWait()
+    previous = ui.mode
+    ui.post(mode="speaking")
+    tts = get_engine()
+    tts.say(pirate_text)
+    tts.runAndWait()
+    ui.post(mode=previous)
 
 # ---------------------------------------
 # 🎙️ Speech Recognition
 # ---------------------------------------
-def listen():
-    recognizer = sr.Recognizer()
+recognizer = sr.Recognizer()
+# Offline wake word check (templates in kuma_client/wake_templates); None = use STT
+wake_spotter = wake_word.WakeWordSpotter.from_dir(sensitivity=WAKE_SENSITIVITY)
+
+def capture():
     with sr.Microphone() as source:
         recognizer.adjust_for_ambient_noise(source, duration=0.7)
         print("🎧 Listening...")
-        audio = recognizer.listen(source, phrase_time_limit=6)
+        return recognizer.listen(source, phrase_time_limit=6)
+
+def heard_wake_word():
+    """Idle phrases are checked locally; only commands go to cloud STT."""
+    audio = capture()
+    if wake_spotter is not None:
+        return wake_spotter.detect(audio)
+    return any(w in transcribe(audio) for w in WAKE_WORDS)
 
+def listen():
+    return transcribe(capture())
+
+def transcribe(audio):
     try:
         text = recognizer.recognize_google(audio)
         print(f"🗣️ You said: {text}")
@@ -96,43 +141,107 @@ luffy_label.bind("<Button-1>", start_drag)
 luffy_label.bind("<B1-Motion>", on_drag)
 
 # ---------------------------------------
-# ⚡ Animation effects
+# ⚡ Animation & UI events
 # ---------------------------------------
-def animate_glow(active=True):
-    """Simple brightness pulse animation to simulate talking/listening"""
+# Tk may only be touched from the main thread. The assistant thread posts
+# updates to a queue that the main loop drains every animation tick, and
+# every frame of every pulse is rendered once, up front.
+def build_frames():
+    """mode -> one PhotoImage per step of its brightness pulse (shared when equal)."""
     enhancer = ImageEnhance.Brightness(base_img)
-    factor = 1.2 if active else 1.0
-    img = enhancer.enhance(factor)
-    frame = ImageTk.PhotoImage(img)
-    luffy_label.configure(image=frame)
-    luffy_label.image = frame
+    rendered = {}
+    frames = {}
+    for mode, (low, high, _) in PULSES.items():
+        frames[mode] = []
+        for i in range(FRAMES_PER_PULSE):
+            level = low + (high - low) * (1 - math.cos(2 * math.pi * i / FRAMES_PER_PULSE)) / 2
+            level = round(level, 2)
+            if level not in rendered:
+                rendered[level] = ImageTk.PhotoImage(enhancer.enhance(level))
+            frames[mode].append(rendered[level])
+    return frames
+
+class UI:
+    """Thread-safe front for the widgets: post() from anywhere, run() on the Tk thread."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.events = queue.Queue()
+        self.mode = "idle"         # last mode posted (assistant thread's view)
+        self.showing = "idle"      # mode being animated (Tk thread's view)
+        self.mode_since = time.perf_counter()
+        self.shown = None
+
+    def post(self, mode=None, status=None, dialogue=None):
+        if mode is not None:
+            self.mode = mode  # read back by speak() to restore it
+        self.events.put((mode, status, dialogue))
+
+    def run(self):
+        self._tick()
+
+    def _tick(self):
+        start = time.perf_counter()
+        while True:
+            try:
+                mode, status, dialogue = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if mode is not None and mode != self.showing:
+                self.showing, self.mode_since = mode, start
+            if status is not None:
+                status_label.config(text=status)
+            if dialogue is not None:
+                dialogue_label.config(text=dialogue)
+
+        period = PULSES[self.showing][2]
+        step = int((start - self.mode_since) / period * FRAMES_PER_PULSE) % FRAMES_PER_PULSE
+        frame = self.frames[self.showing][step]
+        if frame is not self.shown:
+            luffy_label.configure(image=frame)
+            self.shown = frame
+        # hold the frame rate however long this tick took
+        delay = 1000 / ANIMATION_FPS - (time.perf_counter() - start) * 1000
+        root.after(max(1, int(delay)), self._tick)
+
+ui = UI(build_frames())
 
 # ---------------------------------------
 # 🤖 Assistant Logic
 # ---------------------------------------
-def query_backend(cmd):
+def query_backend(cmd, on_sentence=None):
+    """Stream the reply, passing each sentence to on_sentence as it arrives."""
+    def emit(text):
+        if on_sentence and text:
+            on_sentence(text)
+        return text
+
     try:
-        res = requests.post(BACKEND_URL, json={"text": cmd}, timeout=30)
-        if res.status_code == 200:
-            return res.json().get("reply", "")
-        return f"Server error {res.status_code}, Cap’n!"
+        reply, timings = backend.stream_reply(cmd, on_sentence=on_sentence)
+        if timings:
+            print("⏱️ " + ", ".join(f"{k} {v:.0f}ms" for k, v in timings.items()))
+        return reply
+    except backend_client.BackendUnavailable:
+        # backend down: whatever can be answered here still is
+        return emit(local_intents.handle(cmd, offline=True) or "Can’t reach the ship’s brain, Cap’n!")
+    except backend_client.BackendError as e:
+        if e.status:
+            return emit(f"Server error {e.status}, Cap’n!")
+        return emit(str(e) or "Something went wrong, Cap’n!")
     except Exception as e:
-        return f"Network error, Cap’n! ({e})"
+        return emit(f"Network error, Cap’n! ({e})")
 
 def run_assistant():
+    """Runs on its own thread; talks to the window only through ui.post()."""
     speak("Luffy is on deck! Waiting for yer orders, Cap’n!")
     while True:
         # 💤 Waiting for wake word
-        status_label.config(text="🎧 Listening for wake word...")
-        animate_glow(False)
-        root.update()
+        ui.post(mode="idle", status="🎧 Listening for wake word...")
 
-        command = listen()
-        if any(w in command for w in WAKE_WORDS):
+        if heard_wake_word():
+            ui.post(mode="listening")
             speak("Aye aye, Cap’n! I’m all ears! Let’s chat!")
-            status_label.config(text="☠️ Chat mode active! Say 'stop' to end.")
-            animate_glow(True)
-            root.update()
+            ui.post(status="☠️ Chat mode active! Say 'stop' to end.")
 
             # 💬 Continuous conversation loop
             while True:
@@ -143,19 +252,23 @@ def run_assistant():
                 # 💤 Stop words
                 if any(x in cmd for x in STOP_WORDS):
                     speak("Aye Cap’n, I’ll rest for now!")
-                    status_label.config(text="💤 Sleeping... Say 'Onepiece' to wake me.")
-                    animate_glow(False)
+                    ui.post(mode="idle", status="💤 Sleeping... Say 'Onepiece' to wake me.")
                     break
 
-                dialogue_label.config(text=f"🗣️ {cmd}")
-                status_label.config(text="⚙️ Thinking...")
-                root.update()
+                ui.post(mode="thinking", status="⚙️ Thinking...", dialogue=f"🗣️ {cmd}")
+
+                def say(sentence):
+                    ui.post(dialogue=f"💬 {sentence[:120]}")
+                    speak(sentence)
 
-                reply = query_backend(cmd)
-                dialogue_label.config(text=f"💬 {reply[:120]}...")
-                speak(reply)
-                animate_glow(True)
-                root.update()
+                # ⚡ Time, jokes, opening sites... answered right here
+                reply = local_intents.handle(cmd)
+                if reply:
+                    say(reply)
+                else:
+                    reply = query_backend(cmd, on_sentence=say)
+                ui.post(mode="listening", status="☠️ Chat mode active! Say 'stop' to end.",
+                        dialogue=f"💬 {reply[:120]}...")
 
         time.sleep(0.5)
 
@@ -169,5 +282,6 @@ exit_btn.place(x=230, y=5)
 # ---------------------------------------
 # 🚀 Start
 # ---------------------------------------
+ui.run()
 threading.Thread(target=run_assistant, daemon=True).start()
 root.mainloop()